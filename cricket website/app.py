@@ -1,23 +1,68 @@
-from fastapi import FastAPI, Body, HTTPException
+from fastapi import FastAPI, Body, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
+from fastapi.responses import PlainTextResponse
 import numpy as np
-import itertools
+import inspect
 import os
-import random
-import hashlib
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.pipeline import Pipeline
-from xgboost import XGBRegressor
+from squad_optimizer import TeamArrays, ROLE_NAMES, SquadConstraints, SolverLimitError, constrained_top_k_squads, top_k_squads
+from workbook_cache import WorkbookCache
+from topsis import TopsisStore
+from ml_predictor import MatchPredictor
+from innings_simulator import InningsSimulator
+from tree_ensemble import TreeEnsemble
+import feature_store
+import state_snapshot
+from worker_pool import WorkerPool
+import metrics
+from metrics import stage
+from stats_table import StatsTable, file_version, query_key, make_etag, etag_matches, parse_filter_params
 
 app = FastAPI()
 
-# Global variables for model and transformers
-model_pipeline = None
-training_data = None
+# Global variables for the models
+match_predictor: Optional[MatchPredictor] = None
+innings_simulator: Optional[InningsSimulator] = None
+
+# Ball-by-ball history and saved boosters for MatchPredictor
+ball_by_ball_path = "../all_matches.csv"
+player_model_path = "models/player_model.json"
+agg_model_path = "models/agg_model.json"
+feature_store_path = "models/feature_store.joblib"
+innings_simulator_path = "models/innings_simulator.joblib"
+
+# Startup state (workbooks, compiled team/stats tables, predictor, simulator) pickled for a
+# fast mmap load by the server and every worker; rebuilt whenever one of its sources changes
+state_snapshot_path = os.environ.get("STATE_SNAPSHOT_PATH", "models/startup_state.snapshot")
+
+# Classes pickled into the snapshot; editing their modules invalidates it
+SNAPSHOT_CLASSES = (TeamArrays, StatsTable, MatchPredictor, TreeEnsemble, InningsSimulator)
+
+# Startup progress, reported by /api/ready
+readiness: Dict[str, Any] = {"ready": False, "from_snapshot": False, "load_seconds": None}
+
+# Innings remainders simulated per /api/predict-match request
+SIMULATIONS = 20000
+
+# Upper bound on lineups scored by one /api/predict-match/batch request
+MAX_BATCH_MATCHES = 1000
+
+# Processes running the CPU-bound endpoint work; 0 runs it in the server's thread pool instead
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", min(4, os.cpu_count() or 1)))
+
+# Endpoint -> (concurrent requests, queued requests, seconds a request may queue before a 503)
+ENDPOINT_LIMITS = {
+    "generate-squad": (4, 32, 5.0),
+    "generate-squad-batch": (1, 4, 10.0),
+    "player-stats": (4, 32, 5.0),
+    "predict-match": (4, 32, 5.0),
+    "predict-match-batch": (1, 4, 10.0),
+}
+
+# Lets clients send "X-Profile: 1" to have a request sampled by the profiler
+ALLOW_PROFILING = os.environ.get("ALLOW_PROFILING", "0") == "1"
 
 team_mapping = {
     # Map abbreviations to full names based on your training data
@@ -62,6 +107,47 @@ venue_impact = {
     # Add other venues with default value of 0
 }
 
+# Excel workbook with one sheet of candidates per team - update this to your server path
+excel_file_path = "../ipl_correct_one.xlsx"
+
+# Base directory for stats files
+stats_dir = "/Users/dog/Documents/CricketSquadSelection/codes/cricsquad/public/stats"
+
+# Map player types to stats file prefixes
+player_type_map = {
+    "Batsman": "batsman",
+    "Bowler": "bowler",
+    "Allrounder": "allrounder",
+    "Wicketkeeper": "wicketkeeper"
+}
+
+# Map seasons to stats file suffixes
+season_map = {
+    "overall": "overall",
+    "lastseason": "lastseason"
+}
+
+# Parsed workbooks shared by all endpoints, refreshed when a file's mtime changes
+workbook_cache = WorkbookCache()
+
+# Team name -> (source sheet, compiled TeamArrays)
+team_arrays_cache: Dict[str, tuple] = {}
+
+# Normalized Form/Consistency matrices per team and memoized TOPSIS scores per weight pair
+topsis_store = TopsisStore()
+
+# Upper bound on weight pairs scored by one /api/generate-squad/batch request
+MAX_BATCH_WEIGHTS = 200
+
+# Upper bound on squads returned per weight pair
+MAX_TOP_K = 20
+
+# Stats workbook path -> (source sheet, StatsTable)
+stats_table_cache: Dict[str, tuple] = {}
+
+# Largest page served by /api/player-stats; requests without a page_size get every row
+MAX_STATS_PAGE_SIZE = 1000
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -69,17 +155,75 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Profile-Id"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count and time every request by route, and profile it when asked to"""
+    profile = None
+    token = None
+    if ALLOW_PROFILING and request.headers.get("x-profile") == "1":
+        profile = {}
+        token = metrics.profile_request.set(profile)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        if token is not None:
+            metrics.profile_request.reset(token)
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        metrics.request_duration.observe((endpoint,), time.perf_counter() - start)
+        metrics.requests_total.inc((endpoint, str(status)))
+    if profile and "id" in profile:
+        response.headers["X-Profile-Id"] = profile["id"]
+    return response
+
+class CountRule(BaseModel):
+    # "overseas", "indian", "Batsman", "Bowler", "Allrounder", "Wicketkeeper", "bowling_option"
+    # or a Bowler_Type such as "Pace" or "Spin"
+    group: str
+    min: Optional[int] = None
+    max: Optional[int] = None
+
+class SquadRules(BaseModel):
+    positions: Optional[List[int]] = None  # batting positions to fill (1-11 when omitted); [] for none
+    squad_size: Optional[int] = None  # defaults to the number of positions; extra players are reserves
+    counts: List[CountRule] = [CountRule(group="overseas", min=4, max=4), CountRule(group="Wicketkeeper", min=1)]
+    locked_players: List[str] = []
+    excluded_players: List[str] = []
+    eligible_positions: Dict[str, List[int]] = {}  # player -> extra positions they can bat at
+    position_flex: int = 0  # players can also bat this many positions either side of their own
+    top_k: int = 5
+
 class SquadRequest(BaseModel):
     form_weight: float = 0.7
     consistency_weight: float = 0.3
     team_name: str = "CSK"
+    rules: Optional[SquadRules] = None
+
+class WeightPair(BaseModel):
+    form_weight: float
+    consistency_weight: float
+
+class SquadBatchRequest(BaseModel):
+    team_name: str = "CSK"
+    weights: List[WeightPair]
+    rules: Optional[SquadRules] = None
 
 # New model for player stats request
 class PlayerStatsRequest(BaseModel):
     player_type: str  # "Batsman", "Bowler", "Allrounder", "Wicketkeeper"
     season: str  # "overall", "lastseason"
+    columns: Optional[List[str]] = None  # all columns when omitted
+    filters: Optional[Dict[str, Any]] = None  # column -> value, or {"min": .., "max": .., "contains": ..}
+    sort_by: Optional[str] = None
+    descending: bool = False
+    page: int = 1
+    page_size: Optional[int] = None
 
 class MatchPredictionRequest(BaseModel):
     players: List[str]
@@ -92,177 +236,508 @@ class MatchPredictionRequest(BaseModel):
     wickets_left: int = 10
     current_run_rate: float = 0
     last_five: float = 0
+    target: Optional[float] = None  # total the chasing side must reach to win (first-innings score + 1)
+
+class MatchPredictionBatchRequest(BaseModel):
+    matches: List[MatchPredictionRequest]
 
 # Initialize the model on startup
 @app.on_event("startup")
 async def startup_event():
-    global model_pipeline, training_data
+    load_state()
+    worker_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    worker_pool.shutdown()
+
+def load_state():
+    """
+    Load the models and workbooks, from the state snapshot when it is up to date;
+    runs in the server process and once in every pool worker
+    """
+    start = time.perf_counter()
+    state = state_snapshot.load(state_snapshot_path, snapshot_sources())
+    if state is not None:
+        restore_state(state)
+        print(f"Startup state loaded from {state_snapshot_path}")
+    else:
+        build_state()
+        save_state_snapshot()
+    readiness.update(ready=True, from_snapshot=state is not None,
+                     load_seconds=round(time.perf_counter() - start, 3))
+
+def build_state():
+    """Load the models and parse the workbooks from their sources"""
+    global match_predictor, innings_simulator
     try:
-        # Load the training data for fallback calculations
-        training_data = pd.read_csv("ProcessedDataInningsIPL.csv")
-        print("Training data loaded successfully!")
-        
+        match_predictor = load_match_predictor()
+        print("Match predictor loaded successfully!")
     except Exception as e:
-        print(f"Error loading training data: {str(e)}")
-        print("Will use default values for predictions")
+        print(f"Error loading match predictor: {str(e)}")
+        print("Will use heuristic scores for predictions")
 
-@app.post("/api/generate-squad")
-def generate_squad(request: SquadRequest = Body(...)):
-    # Excel file path - update this to your server path
-    excel_file_path = "../ipl_correct_one.xlsx"
-    sheet_name = request.team_name
-    print(request)
-    # Read the Excel file
-    df = pd.read_excel(excel_file_path, sheet_name=sheet_name)
-    
-    # Define criteria
-    criteria = ['Form', 'Consistency']
-    
-    # Extract decision matrix
-    decision_matrix = df[criteria].values.astype(float)
-    
-    # Normalize the decision matrix
-    norm_denominator = np.sqrt((decision_matrix ** 2).sum(axis=0))
-    norm_matrix = decision_matrix / norm_denominator
-    form_weight = request.form_weight
-    consistency_weight = request.consistency_weight
-    # Apply weights
-    weights = np.array([form_weight, consistency_weight])
-    weighted_norm_matrix = norm_matrix * weights
-    
-    # Determine ideal and anti-ideal solutions
-    ideal_solution = weighted_norm_matrix.max(axis=0)
-    anti_ideal_solution = weighted_norm_matrix.min(axis=0)
+    try:
+        innings_simulator = load_innings_simulator()
+        print("Innings simulator loaded successfully!")
+    except Exception as e:
+        print(f"Error loading innings simulator: {str(e)}")
+        print("Predictions will not include simulated score distributions")
+
+    preload_workbooks()
+
+def snapshot_sources() -> List[str]:
+    """Every file the startup state is built from"""
+    stats_files = [
+        os.path.join(directory, f"{file_prefix}_{file_suffix}.xlsx")
+        for directory in (stats_dir, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+        for file_prefix in player_type_map.values()
+        for file_suffix in season_map.values()
+    ]
+    model_files = [player_model_path, agg_model_path, feature_store_path, innings_simulator_path]
+    modules = [inspect.getfile(cls) for cls in SNAPSHOT_CLASSES]
+    return [excel_file_path] + stats_files + model_files + modules
+
+def restore_state(state: Dict[str, Any]):
+    global match_predictor, innings_simulator
+    match_predictor = state["match_predictor"]
+    innings_simulator = state["innings_simulator"]
+    workbook_cache.restore(state["workbooks"])
+    team_arrays_cache.update(state["team_arrays"])
+    stats_table_cache.update(state["stats_tables"])
+
+def save_state_snapshot():
+    try:
+        state_snapshot.save(state_snapshot_path, {
+            "match_predictor": match_predictor,
+            "innings_simulator": innings_simulator,
+            "workbooks": workbook_cache.entries(),
+            "team_arrays": dict(team_arrays_cache),
+            "stats_tables": dict(stats_table_cache),
+        }, snapshot_sources())
+    except Exception as e:
+        print(f"Error saving startup snapshot: {str(e)}")
+
+def load_match_predictor() -> MatchPredictor:
+    """Load the saved boosters and feature store once and warm them up; nothing is retrained"""
+    predictor = MatchPredictor()
+    # Models first, so a missing one fails before the full ball-by-ball parse below
+    predictor.load_models(player_model_path, agg_model_path)
+    if os.path.exists(feature_store_path):
+        predictor.load_feature_store(feature_store_path)
+    else:
+        # First run: derive the features from the ball-by-ball data and persist them
+        predictor.load_data(ball_by_ball_path)
+        os.makedirs(os.path.dirname(feature_store_path), exist_ok=True)
+        predictor.save_feature_store(feature_store_path)
+    predictor.warm_up()
+    return predictor
+
+def load_innings_simulator() -> InningsSimulator:
+    """Load the fitted ball outcome probabilities, fitting them from the ball-by-ball data on first run"""
+    if os.path.exists(innings_simulator_path):
+        return InningsSimulator.load(innings_simulator_path)
+    simulator = InningsSimulator.fit(feature_store.read_table(ball_by_ball_path))
+    os.makedirs(os.path.dirname(innings_simulator_path), exist_ok=True)
+    simulator.save(innings_simulator_path)
+    return simulator
+
+def cache_counters() -> Dict[str, Dict[str, Any]]:
+    """Workbook cache and TOPSIS store counters of the calling process"""
+    return {"cache": workbook_cache.stats(), "topsis": topsis_store.stats()}
+
+# CPU-bound handler work runs here, under per-endpoint concurrency limits
+worker_pool = WorkerPool(WORKER_PROCESSES, ENDPOINT_LIMITS, initializer=load_state, counters=cache_counters)
+
+def total_cache_counters() -> Dict[str, Dict[str, Any]]:
+    """
+    cache_counters() summed over the server process and the pool workers, which keep
+    their own caches (each worker as of its last call); the max_* limits are per process
+    """
+    totals = cache_counters()
+    for worker in worker_pool.worker_counters().values():
+        for group, stats in worker.items():
+            for key, value in stats.items():
+                if not key.startswith("max_") and isinstance(value, (int, float)):
+                    totals[group][key] += value
+    return totals
+
+def heuristic_score(batting_team: str, venue: str, innings: int) -> float:
+    """Fallback prediction from team base scores and venue impact"""
+    # Get base score for the batting team or use a default
+    base_score = team_base_scores.get(batting_team, 160)
     
-    # Calculate distances
-    distance_to_ideal = np.sqrt(((weighted_norm_matrix - ideal_solution) ** 2).sum(axis=1))
-    distance_to_anti_ideal = np.sqrt(((weighted_norm_matrix - anti_ideal_solution) ** 2).sum(axis=1))
+    # Adjust for venue effect
+    venue_effect = venue_impact.get(venue, 0)
     
-    # Compute TOPSIS score
-    df['TOPSIS_Score'] = distance_to_anti_ideal / (distance_to_ideal + distance_to_anti_ideal)
-    df['Weighted_Form'] = df['Form'] * form_weight
-    df['Weighted_Consistency'] = df['Consistency'] * consistency_weight
-    df['Weighted_Sum_Score'] = df['Weighted_Form'] + df['Weighted_Consistency']
-
-    # Group players by Position
-    positions = range(1, 12)
-    grouped = {pos: df[df['Position'] == pos].to_dict('records')
-               for pos in positions if not df[df['Position'] == pos].empty}
+    # Adjust for innings
+    innings_effect = -10 if innings == 2 else 0  # Second innings typically scores less
     
-    # Generate all possible squad combinations
-    all_squads = list(itertools.product(*(grouped[pos] for pos in positions)))
+    # Calculate final prediction
+    predicted_score = base_score + venue_effect + innings_effect
     
-    # Filter squads to meet constraints
-    valid_squads = []
-    for squad in all_squads:
-        foreign_count = sum(1 for player in squad if player['Nationality'].strip().lower() == 'foreginer')
-        wk_count = sum(1 for player in squad if 'WK' in player['Type'])
-        if foreign_count == 4 and wk_count >= 1:
-            valid_squads.append(squad)
+    # Ensure score is reasonable (between 100 and 250)
+    return max(100, min(250, predicted_score))
+
+def resolve_stats_path(file_prefix: str, file_suffix: str) -> Optional[str]:
+    """Locate a stats workbook, e.g. "batsman_overall.xlsx", or return None if it is missing"""
+    file_name = f"{file_prefix}_{file_suffix}.xlsx"
+    file_path = os.path.join(stats_dir, file_name)
+    if not os.path.exists(file_path):
+        # Optional fallback if needed (remove if not desired)
+        file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", file_name)
+        if not os.path.exists(file_path):
+            return None
+    return file_path
+
+def preload_workbooks():
+    """Parse the team sheets and every stats workbook into the shared cache and compile them"""
+    try:
+        sheets = workbook_cache.preload(excel_file_path)
+        print(f"Loaded {len(sheets)} team sheets from {excel_file_path}")
+        for sheet in sheets:
+            try:
+                get_team_arrays(sheet)
+            except KeyError:
+                # Not a team lineup (e.g. the Wicket-Keeper sheet); it stays cached as a workbook
+                pass
+    except Exception as e:
+        print(f"Error preloading team sheets: {str(e)}")
+
+    for file_prefix in player_type_map.values():
+        for file_suffix in season_map.values():
+            file_path = resolve_stats_path(file_prefix, file_suffix)
+            if file_path is None:
+                continue
+            try:
+                get_stats_table(file_path)
+            except Exception as e:
+                print(f"Error preloading {file_path}: {str(e)}")
+
+@app.post("/api/reload-cache")
+def reload_cache():
+    """Drop every cached workbook and parse them again from disk"""
+    readiness["ready"] = False
+    try:
+        workbook_cache.clear()
+        preload_workbooks()
+        save_state_snapshot()
+        # Workers hold their own caches, so replace them with ones loaded from the new snapshot
+        worker_pool.restart()
+    finally:
+        readiness["ready"] = True
+    return {"cache": workbook_cache.stats()}
+
+@app.get("/api/ready")
+def ready(response: Response):
+    """Readiness probe: 200 once startup state is loaded, 503 while loading or reloading"""
+    if not readiness["ready"]:
+        response.status_code = 503
+    return {
+        **readiness,
+        "team_sheets": len(team_arrays_cache),
+        "stats_tables": len(stats_table_cache),
+        "match_predictor": match_predictor is not None,
+        "innings_simulator": innings_simulator is not None,
+        "worker_processes": worker_pool.processes,
+    }
+
+@app.get("/api/cache-stats")
+def cache_stats():
+    """Cache counters summed over the server and worker processes, and worker pool state"""
+    return {**total_cache_counters(), "workers": worker_pool.stats()}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Request, stage, worker pool and cache metrics in the Prometheus text format"""
+    counters = total_cache_counters()
+    cache, topsis = counters["cache"], counters["topsis"]
+    workers = worker_pool.stats()["endpoints"]
+    gauges = {
+        f"worker_pool_{key}": (f"Worker pool {key.replace('_', ' ')} requests per endpoint",
+                               {(name,): stats[key] for name, stats in workers.items()}, ["endpoint"])
+        for key in ("running", "waiting", "completed", "rejected", "timed_out")
+    }
+    gauges["workbook_cache"] = ("Workbook cache counters",
+                                {(key,): cache[key] for key in ("entries", "bytes", "hits", "misses", "evictions")},
+                                ["stat"])
+    gauges["topsis_store"] = ("TOPSIS store counters",
+                              {(key,): value for key, value in topsis.items() if isinstance(value, (int, float))},
+                              ["stat"])
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    """Sampled profile of a request sent with "X-Profile: 1" (see the X-Profile-Id response header)"""
+    profile = metrics.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+def get_team_arrays(team_name: str) -> TeamArrays:
+    """Compiled arrays for a team sheet, rebuilt only when the cached workbook is reloaded"""
+    df = workbook_cache.get(excel_file_path, sheet_name=team_name)
+    cached = team_arrays_cache.get(team_name)
+    if cached is None or cached[0] is not df:
+        cached = (df, TeamArrays(df))
+        team_arrays_cache[team_name] = cached
+    return cached[1]
+
+def compile_squad_rules(team: TeamArrays, rules: Optional[SquadRules]) -> Optional[SquadConstraints]:
+    """
+    Constraints for the general solver, or None when the rules are the classic ones
+    (positions 1-11, exactly 4 overseas, at least one WK), which the faster DP handles
+    """
+    if rules is None:
+        return None
+    if not 1 <= rules.top_k <= MAX_TOP_K:
+        raise HTTPException(status_code=400, detail=f"top_k must be between 1 and {MAX_TOP_K}")
+    if rules.model_dump(exclude={"top_k"}) == SquadRules().model_dump(exclude={"top_k"}):
+        return None
+    counts: Dict[str, tuple] = {}
+    for rule in rules.counts:
+        low, high = counts.get(rule.group, (None, None))
+        # Several rules on one group combine into the tightest bounds
+        if rule.min is not None:
+            low = rule.min if low is None else max(low, rule.min)
+        if rule.max is not None:
+            high = rule.max if high is None else min(high, rule.max)
+        counts[rule.group] = (low, high)
+    try:
+        return SquadConstraints(
+            team, positions=rules.positions, squad_size=rules.squad_size, counts=counts,
+            locked=rules.locked_players, excluded=rules.excluded_players,
+            eligible=rules.eligible_positions, position_flex=rules.position_flex,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def format_squads(team: TeamArrays, topsis_score: np.ndarray, form_weight: float,
+                  consistency_weight: float, constraints: Optional[SquadConstraints] = None,
+                  top_k: int = 5) -> List[Dict[str, Any]]:
+    """Pick the top squads for one set of TOPSIS scores and format them for the response"""
+    weighted_form = team.form * form_weight
+    weighted_consistency = team.consistency * consistency_weight
     
-    # Sort valid squads by total TOPSIS score
-    valid_squads_sorted = sorted(valid_squads,
-                                key=lambda squad: sum(player['TOPSIS_Score'] for player in squad),
-                                reverse=True)
+    # Search the top squads as a (squads x players) matrix of player rows. The classic rules
+    # (exactly 4 overseas, at least one WK, one player per position) go to the DP; anything
+    # else to the integer-programming search
+    assigned = None
+    with stage("squad_search"):
+        if constraints is None:
+            totals, picks = top_k_squads(
+                topsis_score, team.overseas, team.keeper, team.slots,
+                k=top_k, overseas_count=4, require_keeper=True,
+            )
+        else:
+            try:
+                totals, picks, assigned = constrained_top_k_squads(topsis_score, constraints, k=top_k)
+            except SolverLimitError as e:
+                raise HTTPException(status_code=503, detail=str(e))
     
-    # Select top 5 squads
-    top_squads = valid_squads_sorted[:5]
+    with stage("format"):
+        return _format_squad_rows(team, topsis_score, weighted_form, weighted_consistency, totals, picks, assigned)
+
+def _format_squad_rows(team: TeamArrays, topsis_score: np.ndarray, weighted_form: np.ndarray,
+                       weighted_consistency: np.ndarray, totals: np.ndarray, picks: np.ndarray,
+                       assigned: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    stats = team.squad_stats(picks)
     
-    # Format response
+    # Format response, touching only the winning squads
     result = []
-    for idx, squad in enumerate(top_squads, start=1):
-        squad_score = sum(player['TOPSIS_Score'] for player in squad)
-        indian_count = sum(1 for player in squad if player['Nationality'].strip().lower() == 'indian')
-        foreign_count = sum(1 for player in squad if player['Nationality'].strip().lower() == 'foreginer')
-        
+    for idx in range(len(totals)):
         formatted_squad = {
-            "id": idx,
-            "score": round(squad_score, 4),
+            "id": idx + 1,
+            "score": round(float(totals[idx]), 4),
             "players": [],
             "stats": {
-                "indian": indian_count,
-                "foreign": foreign_count,
+                "indian": int(stats["indian"][idx]),
+                "foreign": int(stats["foreign"][idx]),
                 "roles": {
-                    "Batsman": sum(1 for player in squad if player['Type'] == 'BAT'),
-                    "Bowler": sum(1 for player in squad if player['Type'] == 'BOWL'),
-                    "Allrounder": sum(1 for player in squad if player['Type'] == 'AR'),
-                    "Wicketkeeper": sum(1 for player in squad if 'WK' in player['Type'])
+                    "Batsman": int(stats["Batsman"][idx]),
+                    "Bowler": int(stats["Bowler"][idx]),
+                    "Allrounder": int(stats["Allrounder"][idx]),
+                    "Wicketkeeper": int(stats["Wicketkeeper"][idx])
                 }
             }
         }
         
-        for player in sorted(squad, key=lambda p: p['Position']):
+        # Slots are already in batting position order, followed by any reserves
+        for slot, row in enumerate(picks[idx]):
+            position = int(team.position[row]) if assigned is None else int(assigned[idx, slot])
             formatted_squad["players"].append({
-                "id": str(player['Position']),
-                "name": player['Player'],
-                "score": round(float(player['TOPSIS_Score']), 2) if not pd.isna(player['TOPSIS_Score']) else 0.0,
-                "role": "Wicketkeeper" if 'WK' in player['Type'] else 
-                        "Batsman" if player['Type'] == 'BAT' else
-                        "Bowler" if player['Type'] == 'BOWL' else "Allrounder",
-                "bowlerType": player['Bowler_Type'] if not pd.isna(player['Bowler_Type']) else None,
-                "isOverseasPlayer": player['Nationality'].strip().lower() == 'foreginer',
-                "form": round(float(player['Weighted_Form']), 2) if not pd.isna(player['Weighted_Form']) else 0.0,
-                "consistency": round(float(player['Weighted_Consistency']), 2) if not pd.isna(player['Weighted_Consistency']) else 0.0,
-                "position": int(player['Position'])
+                "id": str(position),
+                "name": team.names[row],
+                "score": round(float(topsis_score[row]), 2) if not np.isnan(topsis_score[row]) else 0.0,
+                "role": ROLE_NAMES[team.role[row]],
+                "bowlerType": team.bowler_types[row],
+                "isOverseasPlayer": bool(team.overseas[row]),
+                "form": round(float(weighted_form[row]), 2) if not np.isnan(weighted_form[row]) else 0.0,
+                "consistency": round(float(weighted_consistency[row]), 2) if not np.isnan(weighted_consistency[row]) else 0.0,
+                "position": position
             })
         
-        print(formatted_squad)
         result.append(formatted_squad)
     
-    return {"squads": result}
+    return result
 
-@app.post("/api/player-stats")
-def get_player_stats(request: PlayerStatsRequest = Body(...)):
-    """
-    Retrieve player statistics from Excel files based on player type and season.
-    """
-    try:
-        # Map player types to file prefixes
-        player_type_map = {
-            "Batsman": "batsman",
-            "Bowler": "bowler",
-            "Allrounder": "allrounder",
-            "Wicketkeeper": "wicketkeeper"
-        }
+@app.post("/api/generate-squad")
+async def generate_squad_endpoint(request: SquadRequest = Body(...)):
+    return await worker_pool.run("generate-squad", generate_squad, request)
 
-        # Map seasons to file suffixes
-        season_map = {
-            "overall": "overall",
-            "lastseason": "lastseason"
-        }
+def generate_squad(request: SquadRequest):
+    # Compiled arrays for the team sheet (score inputs, overseas/WK flags, roles, positions)
+    with stage("excel_load"):
+        team = get_team_arrays(request.team_name)
+    
+    # TOPSIS scores from the precomputed normalized matrix, memoized per weight pair
+    with stage("topsis"):
+        topsis_score = topsis_store.scores(
+            request.team_name, team, team.decision_matrix,
+            request.form_weight, request.consistency_weight,
+        )
+    
+    constraints = compile_squad_rules(team, request.rules)
+    top_k = request.rules.top_k if request.rules is not None else 5
+    return {"squads": format_squads(team, topsis_score, request.form_weight, request.consistency_weight,
+                                    constraints, top_k)}
 
-        if request.player_type not in player_type_map:
-            raise HTTPException(status_code=400, detail=f"Invalid player type: {request.player_type}")
+@app.post("/api/generate-squad/batch")
+async def generate_squad_batch_endpoint(request: SquadBatchRequest = Body(...)):
+    return await worker_pool.run("generate-squad-batch", generate_squad_batch, request)
 
-        if request.season not in season_map:
-            raise HTTPException(status_code=400, detail=f"Invalid season: {request.season}")
+def generate_squad_batch(request: SquadBatchRequest):
+    """Top squads for a grid of weight pairs, scoring all uncached pairs in one pass"""
+    if not request.weights:
+        raise HTTPException(status_code=400, detail="At least one weight pair is required")
+    if len(request.weights) > MAX_BATCH_WEIGHTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_WEIGHTS} weight pairs per request")
+    
+    with stage("excel_load"):
+        team = get_team_arrays(request.team_name)
+    pairs = [(w.form_weight, w.consistency_weight) for w in request.weights]
+    with stage("topsis"):
+        scores = topsis_store.scores_batch(request.team_name, team, team.decision_matrix, pairs)
+    
+    # Rules are compiled once and shared by every weight pair
+    constraints = compile_squad_rules(team, request.rules)
+    top_k = request.rules.top_k if request.rules is not None else 5
+    results = []
+    for (form_weight, consistency_weight), topsis_score in zip(pairs, scores):
+        results.append({
+            "form_weight": form_weight,
+            "consistency_weight": consistency_weight,
+            "squads": format_squads(team, topsis_score, form_weight, consistency_weight, constraints, top_k)
+        })
+    return {"team_name": request.team_name, "results": results}
 
-        # Construct file path from the maps
-        file_prefix = player_type_map[request.player_type]
-        file_suffix = season_map[request.season]
+def resolve_player_stats_request(request: PlayerStatsRequest) -> str:
+    """Validate a stats request and return the path of its workbook"""
+    if request.player_type not in player_type_map:
+        raise HTTPException(status_code=400, detail=f"Invalid player type: {request.player_type}")
 
-        # Base directory for stats files
-        stats_dir = "/Users/dog/Documents/CricketSquadSelection/codes/cricsquad/public/stats"
+    if request.season not in season_map:
+        raise HTTPException(status_code=400, detail=f"Invalid season: {request.season}")
 
-        # Build the file path, e.g. "batsman_overall.xlsx"
-        file_path = os.path.join(stats_dir, f"{file_prefix}_{file_suffix}.xlsx")
+    if request.page_size is not None and request.page_size > MAX_STATS_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"page_size must be at most {MAX_STATS_PAGE_SIZE}")
 
-        # Check if file exists
-        if not os.path.exists(file_path):
-            # Optional fallback if needed (remove if not desired)
-            file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", f"{file_prefix}_{file_suffix}.xlsx")
-            if not os.path.exists(file_path):
-                raise HTTPException(status_code=404, detail=f"Stats file not found: {file_prefix}_{file_suffix}.xlsx")
+    # Construct file path from the maps
+    file_prefix = player_type_map[request.player_type]
+    file_suffix = season_map[request.season]
+
+    # Check if file exists
+    file_path = resolve_stats_path(file_prefix, file_suffix)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail=f"Stats file not found: {file_prefix}_{file_suffix}.xlsx")
+    return file_path
+
+def stats_query(request: PlayerStatsRequest) -> Dict[str, Any]:
+    return {
+        "columns": request.columns,
+        "filters": request.filters,
+        "sort_by": request.sort_by,
+        "descending": request.descending,
+        "page": request.page,
+        "page_size": request.page_size,
+    }
+
+def get_stats_table(file_path: str) -> StatsTable:
+    """Query-ready table for a stats workbook, rebuilt only when the cached workbook is reloaded"""
+    df = workbook_cache.get(file_path)
+    cached = stats_table_cache.get(file_path)
+    if cached is None or cached[0] is not df:
+        cached = (df, StatsTable(df))
+        stats_table_cache[file_path] = cached
+    return cached[1]
 
-        # Read Excel file
-        df = pd.read_excel(file_path)
+async def serve_player_stats(request: PlayerStatsRequest, http_request: Request) -> Response:
+    """
+    Answer unchanged stats with 304 from the ETag alone; otherwise query and serialize the
+    table in a worker. The ETag covers the workbook's version and the query.
+    """
+    file_path = resolve_player_stats_request(request)
+    etag = make_etag(file_version(file_path), query_key(**stats_query(request)))
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
 
-        # Convert DataFrame to a list of dicts
-        stats_data = df.to_dict(orient="records")
+    accept_gzip = "gzip" in http_request.headers.get("accept-encoding", "")
+    body, compressed = await worker_pool.run("player-stats", get_player_stats, request, accept_gzip)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.post("/api/player-stats")
+async def get_player_stats_endpoint(http_request: Request, request: PlayerStatsRequest = Body(...)):
+    return await serve_player_stats(request, http_request)
 
-        # Return the data
-        return {"stats": stats_data}
+@app.get("/api/player-stats")
+async def get_player_stats_query(
+    http_request: Request,
+    player_type: str,
+    season: str,
+    columns: Optional[str] = None,  # comma separated
+    filter: Optional[List[str]] = Query(None),  # repeated "Runs>=300", "Type=BAT", "Player~sharma"
+    sort_by: Optional[str] = None,
+    descending: bool = False,
+    page: int = 1,
+    page_size: Optional[int] = None,
+):
+    try:
+        filters = parse_filter_params(filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    request = PlayerStatsRequest(
+        player_type=player_type,
+        season=season,
+        columns=columns.split(",") if columns else None,
+        filters=filters or None,
+        sort_by=sort_by,
+        descending=descending,
+        page=page,
+        page_size=page_size,
+    )
+    return await serve_player_stats(request, http_request)
+
+def get_player_stats(request: PlayerStatsRequest, accept_gzip: bool = False) -> Tuple[bytes, bool]:
+    """
+    Retrieve player statistics from Excel files based on player type and season,
+    as a serialized JSON body (gzipped when accepted and large enough).
+    """
+    try:
+        file_path = resolve_player_stats_request(request)
+
+        # Query the preloaded table built from the workbook cache
+        with stage("excel_load"):
+            table = get_stats_table(file_path)
+        with stage("query"):
+            return table.render(accept_gzip, **stats_query(request))
     
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error retrieving player stats: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve player statistics: {str(e)}")
@@ -273,7 +748,10 @@ def get_player_impact(player_list):
     return 0
 
 @app.post("/api/predict-match")
-def predict_match(request: MatchPredictionRequest = Body(...)):
+async def predict_match_endpoint(request: MatchPredictionRequest = Body(...)):
+    return await worker_pool.run("predict-match", predict_match, request)
+
+def predict_match(request: MatchPredictionRequest):
     try:
         if len(request.players) != 11:
             raise HTTPException(status_code=400, detail="Exactly 11 players required")
@@ -282,33 +760,40 @@ def predict_match(request: MatchPredictionRequest = Body(...)):
         batting_team = team_mapping.get(request.batting_team, request.batting_team)
         bowling_team = team_mapping.get(request.bowling_team, request.bowling_team)
         
-        print(f"Using batting team: {batting_team} (from {request.batting_team})")
-        print(f"Using bowling team: {bowling_team} (from {request.bowling_team})")
-        print(f"Venue: {request.venue}")
+        # Use the trained models when they are loaded and know the venue
+        predicted_score = None
+        prediction_source = "heuristic"
+        if match_predictor is not None and request.venue in match_predictor.venue_lookup:
+            try:
+                with stage("model_inference"):
+                    predicted_score = match_predictor.predict_innings(
+                        request.players, request.venue, batting_team, bowling_team, request.innings
+                    )
+                prediction_source = "model"
+            except Exception as e:
+                print(f"Model prediction failed, using heuristic: {str(e)}")
         
-        # Create a request key to check if we've seen this exact request before
-        request_key = f"{batting_team}_{bowling_team}_{request.venue}_{request.innings}"
+        if predicted_score is None:
+            with stage("heuristic"):
+                predicted_score = heuristic_score(batting_team, request.venue, request.innings)
         
-        # Get base score for the batting team or use a default
-        base_score = team_base_scores.get(batting_team, 160)
-        
-        # Adjust for venue effect
-        venue_effect = venue_impact.get(request.venue, 0)
-        
-        # Adjust for innings
-        innings_effect = -10 if request.innings == 2 else 0  # Second innings typically scores less
-        
-        # Calculate final prediction
-        predicted_score = base_score + venue_effect + innings_effect
-        
-        # Ensure score is reasonable (between 100 and 250)
-        predicted_score = max(100, min(250, predicted_score))
-        
-        print(f"Prediction components: Base={base_score}, Venue={venue_effect}, Innings={innings_effect}")
-        print(f"Final predicted score: {predicted_score:.2f}")
+        # Score distribution (and chase win probability) simulated from the current state
+        simulation = None
+        if innings_simulator is not None:
+            with stage("simulation"):
+                simulation = innings_simulator.simulate(
+                    current_score=request.current_score,
+                    balls_left=request.balls_left,
+                    wickets_left=request.wickets_left,
+                    current_run_rate=request.current_run_rate,
+                    last_five=request.last_five,
+                    target=request.target if request.innings == 2 else None,
+                    n_simulations=SIMULATIONS,
+                )
         
         return {
             "predicted_score": round(predicted_score, 2),
+            "prediction_source": prediction_source,
             "batting_team": str(request.batting_team),
             "bowling_team": str(request.bowling_team),
             "venue": str(request.venue),
@@ -317,13 +802,63 @@ def predict_match(request: MatchPredictionRequest = Body(...)):
             "balls_left": int(request.balls_left),
             "wickets_left": int(request.wickets_left),
             "current_run_rate": float(request.current_run_rate),
-            "last_five": float(request.last_five)
+            "last_five": float(request.last_five),
+            "simulation": simulation
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in prediction: {str(e)}")  # Add logging
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/api/predict-match/batch")
+async def predict_match_batch_endpoint(request: MatchPredictionBatchRequest = Body(...)):
+    return await worker_pool.run("predict-match-batch", predict_match_batch, request)
+
+def predict_match_batch(request: MatchPredictionBatchRequest):
+    """Predict many lineups with a single player-model and a single aggregator call"""
+    if match_predictor is None:
+        raise HTTPException(status_code=503, detail="Match predictor is not loaded")
+    if not request.matches:
+        raise HTTPException(status_code=400, detail="At least one match is required")
+    if len(request.matches) > MAX_BATCH_MATCHES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_MATCHES} matches per request")
+    for match in request.matches:
+        if len(match.players) != 11:
+            raise HTTPException(status_code=400, detail="Exactly 11 players required")
+
+    try:
+        with stage("model_inference"):
+            scores = match_predictor.predict_innings_batch(
+                [match.players for match in request.matches],
+                [match.venue for match in request.matches],
+                [match.innings for match in request.matches],
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in batch prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+    return {
+        "predictions": [
+            {
+                "predicted_score": round(float(score), 2),
+                "batting_team": str(match.batting_team),
+                "bowling_team": str(match.bowling_team),
+                "venue": str(match.venue),
+                "innings": int(match.innings),
+                "current_score": float(match.current_score),
+                "balls_left": int(match.balls_left),
+                "wickets_left": int(match.wickets_left),
+                "current_run_rate": float(match.current_run_rate),
+                "last_five": float(match.last_five)
+            }
+            for match, score in zip(request.matches, scores)
+        ]
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
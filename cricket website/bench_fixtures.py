@@ -0,0 +1,201 @@
+"""
+Synthetic inputs for benchmark.py, shaped like the project's real data files.
+
+Team sheets follow ipl_correct_one.xlsx, stats sheets follow the batsman/bowler/...
+workbooks in cricsquad/public/stats, and ball-by-ball rows follow the cricsheet
+all_matches.csv export. Everything is drawn from a seeded generator, so the same
+arguments always produce the same files.
+"""
+import os
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+TEAMS = ['CSK', 'DC', 'GT', 'KKR', 'LSG', 'MI', 'PBKS', 'RCB', 'RR', 'SRH']
+
+# Player type for each batting position, before keepers are mixed in
+POSITION_TYPES = ['BAT', 'BAT', 'BAT', 'BAT', 'AR', 'AR', 'AR', 'BOWL', 'BOWL', 'BOWL', 'BOWL']
+
+BALL_BY_BALL_COLUMNS = [
+    'match_id', 'season', 'start_date', 'venue', 'innings', 'ball', 'batting_team', 'bowling_team',
+    'striker', 'non_striker', 'bowler', 'runs_off_bat', 'extras', 'wides', 'noballs', 'byes',
+    'legbyes', 'penalty', 'wicket_type', 'player_dismissed', 'other_wicket_type', 'other_player_dismissed',
+]
+
+STATS_COLUMNS = ['Player', 'Span', 'Mat', 'Inns', 'NO', 'Runs', 'HS', 'Ave', 'BF', 'SR',
+                 "100's", "50's", 'Zeros', '4s', '6s', 'Type', 'MostCommonPosition']
+
+
+def make_team_sheet(team: str = 'CSK', candidates_per_position: Union[int, Sequence[int]] = 3,
+                    overseas_share: float = 0.35, keeper_share: float = 0.15, seed: int = 0) -> pd.DataFrame:
+    """
+    One team sheet with `candidates_per_position` players for each of the 11 positions
+    (an int, or one count per position). At least one keeper and four overseas players
+    are always present, so the squad constraints can be met.
+    """
+    rng = np.random.default_rng(seed)
+    if isinstance(candidates_per_position, int):
+        candidates_per_position = [candidates_per_position] * 11
+    position = np.repeat(np.arange(1, 12), candidates_per_position)
+    n = len(position)
+
+    types = np.array([POSITION_TYPES[p - 1] for p in position], dtype=object)
+    keeper = rng.random(n) < keeper_share
+    keeper[rng.integers(n)] = True
+    types[keeper] = [t + ',WK' if t != 'BOWL' else 'BAT,WK' for t in types[keeper]]
+
+    overseas = rng.random(n) < overseas_share
+    if overseas.sum() < 4:
+        overseas[rng.choice(n, 4, replace=False)] = True
+
+    form_ahp = rng.gamma(2.0, 20.0, n)
+    consistency_ahp = rng.gamma(2.0, 40.0, n)
+    is_bowler = np.isin(types, ['AR', 'BOWL'])
+    return pd.DataFrame({
+        'Player': [f"{team} Player {i + 1}" for i in range(n)],
+        'Position': position,
+        'Type': types,
+        'Consistency_AHP': consistency_ahp,
+        'Consistency_PCA': consistency_ahp * rng.uniform(1.5, 3.5, n),
+        'Consistency': consistency_ahp * rng.uniform(0.5, 2.5, n),
+        'Form_AHP': form_ahp,
+        'Form_PCA': form_ahp * rng.uniform(1.5, 3.0, n),
+        'Form': form_ahp * rng.uniform(0.5, 2.0, n),
+        'Team': team,
+        'Nationality': np.where(overseas, 'Foreginer', 'Indian'),
+        'Bowler_Type': np.where(is_bowler, rng.choice(['Pace', 'Spin'], n), None),
+        'AR Type': np.where(types == 'AR', rng.choice(['Batting', 'Bowling'], n), None),
+        'Span': '2020-2024',
+    })
+
+
+def write_team_workbook(path: str, teams: List[str] = TEAMS,
+                        candidates_per_position: Union[int, Sequence[int]] = 3, seed: int = 0) -> str:
+    with pd.ExcelWriter(path) as writer:
+        for i, team in enumerate(teams):
+            make_team_sheet(team, candidates_per_position, seed=seed + i).to_excel(writer, sheet_name=team, index=False)
+    return path
+
+
+def make_stats_sheet(n_players: int = 60, seed: int = 0) -> pd.DataFrame:
+    """A batting stats sheet in the layout of cricsquad/public/stats/batsman_overall.xlsx"""
+    rng = np.random.default_rng(seed)
+    mat = rng.integers(5, 250, n_players)
+    inns = np.maximum(1, (mat * rng.uniform(0.6, 1.0, n_players)).astype(int))
+    not_out = (inns * rng.uniform(0, 0.3, n_players)).astype(int)
+    bf = (inns * rng.uniform(8, 25, n_players)).astype(int)
+    runs = (bf * rng.uniform(1.0, 1.6, n_players)).astype(int)
+    return pd.DataFrame({
+        'Player': [f"Stats Player {i + 1}" for i in range(n_players)],
+        'Span': '2015-2024',
+        'Mat': mat,
+        'Inns': inns,
+        'NO': not_out,
+        'Runs': runs,
+        'HS': np.minimum(runs, rng.integers(10, 130, n_players)),
+        'Ave': np.round(runs / np.maximum(inns - not_out, 1), 2),
+        'BF': bf,
+        'SR': np.round(runs * 100 / np.maximum(bf, 1), 2),
+        "100's": rng.integers(0, 4, n_players),
+        "50's": rng.integers(0, 30, n_players),
+        'Zeros': rng.integers(0, 15, n_players),
+        '4s': (runs * rng.uniform(0.05, 0.12, n_players)).astype(int),
+        '6s': (runs * rng.uniform(0.01, 0.06, n_players)).astype(int),
+        'Type': rng.choice(['BAT', 'AR', 'BOWL', 'BAT,WK'], n_players),
+        'MostCommonPosition': rng.integers(1, 12, n_players),
+    })
+
+
+def write_stats_workbooks(directory: str, prefixes: List[str], suffixes: List[str],
+                          n_players: int = 60, seed: int = 0) -> List[str]:
+    """Write "<prefix>_<suffix>.xlsx" stats workbooks, as resolve_stats_path expects them"""
+    paths = []
+    for i, prefix in enumerate(prefixes):
+        for j, suffix in enumerate(suffixes):
+            path = os.path.join(directory, f"{prefix}_{suffix}.xlsx")
+            make_stats_sheet(n_players, seed=seed + i * len(suffixes) + j).to_excel(path, index=False)
+            paths.append(path)
+    return paths
+
+
+def make_ball_by_ball(n_matches: int = 500, n_players: int = 300, n_venues: int = 12,
+                      seed: int = 0) -> pd.DataFrame:
+    """
+    Ball-by-ball rows for `n_matches` two-innings T20 matches. Innings end at 20 overs or
+    10 wickets; about 4% of deliveries are wides that are re-bowled.
+    """
+    rng = np.random.default_rng(seed)
+    players = np.array([f"Player {i}" for i in range(n_players)], dtype=object)
+    venues = np.array([f"Venue {i}" for i in range(n_venues)], dtype=object)
+    teams = np.array(TEAMS, dtype=object)
+    innings_rows: List[pd.DataFrame] = []
+
+    for m in range(n_matches):
+        venue_idx = rng.integers(n_venues)
+        venue = venues[venue_idx]
+        pair = rng.choice(len(teams), 2, replace=False)
+        # Venues differ slightly in how often fours replace sixes
+        venue_boost = 0.02 * (venue_idx % 5)
+        for innings in (1, 2):
+            xi = rng.choice(players, 11, replace=False)
+            n = 132  # enough deliveries for 120 legal balls plus wides
+            wide = rng.random(n) < 0.04
+            legal_no = np.cumsum(~wide) - (~wide)
+            runs = rng.choice([0, 1, 2, 3, 4, 6], n, p=[0.36, 0.34, 0.07, 0.01, 0.13 + venue_boost, 0.09 - venue_boost])
+            runs[wide] = 0
+            out = (rng.random(n) < 0.05) & ~wide
+            wickets_before = np.cumsum(out) - out
+            keep = (legal_no < 120) & (wickets_before < 10)
+            runs, wide, out, legal_no, wickets_before = (
+                runs[keep], wide[keep], out[keep], legal_no[keep], wickets_before[keep]
+            )
+            striker = xi[np.minimum(wickets_before, 10) % 11]
+            over, ball_in_over = legal_no // 6, legal_no % 6 + 1
+            innings_rows.append(pd.DataFrame({
+                'match_id': 1000000 + m,
+                'season': 2015 + m * 10 // max(n_matches, 1),
+                'start_date': '2024-04-01',
+                'venue': venue,
+                'innings': innings,
+                'ball': np.round(over + ball_in_over / 10, 1),
+                'batting_team': teams[pair[innings - 1]],
+                'bowling_team': teams[pair[2 - innings]],
+                'striker': striker,
+                'non_striker': xi[(np.minimum(wickets_before, 10) + 1) % 11],
+                'bowler': 'Bowler ' + (over % 5).astype(str),
+                'runs_off_bat': runs,
+                'extras': wide.astype(int),
+                'wides': np.where(wide, 1, np.nan),
+                'noballs': np.nan,
+                'byes': np.nan,
+                'legbyes': np.nan,
+                'penalty': np.nan,
+                'wicket_type': np.where(out, 'caught', None),
+                'player_dismissed': np.where(out, striker, None),
+                'other_wicket_type': None,
+                'other_player_dismissed': None,
+            }))
+    return pd.concat(innings_rows, ignore_index=True)[BALL_BY_BALL_COLUMNS]
+
+
+def write_ball_by_ball(path: str, n_matches: int = 500, n_players: int = 300, n_venues: int = 12,
+                       seed: int = 0) -> str:
+    make_ball_by_ball(n_matches, n_players, n_venues, seed).to_csv(path, index=False)
+    return path
+
+
+def write_fixtures(directory: str, candidates_per_position: int = 3, n_matches: int = 500,
+                   n_stats_players: int = 60, stats_prefixes: List[str] = None,
+                   stats_suffixes: List[str] = None, seed: int = 0) -> Dict[str, str]:
+    """Write a full set of fixtures into `directory` and return their paths"""
+    os.makedirs(directory, exist_ok=True)
+    stats_dir = os.path.join(directory, 'stats')
+    os.makedirs(stats_dir, exist_ok=True)
+    write_stats_workbooks(stats_dir, stats_prefixes or ['batsman', 'bowler', 'allrounder', 'wicketkeeper'],
+                          stats_suffixes or ['overall', 'lastseason'], n_stats_players, seed)
+    return {
+        'teams': write_team_workbook(os.path.join(directory, 'teams.xlsx'), TEAMS, candidates_per_position, seed),
+        'ball_by_ball': write_ball_by_ball(os.path.join(directory, 'all_matches.csv'), n_matches, seed=seed),
+        'stats_dir': stats_dir,
+    }
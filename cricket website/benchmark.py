@@ -0,0 +1,290 @@
+"""
+Benchmarks for the project's hot paths, run against synthetic fixtures.
+
+Microbenchmarks time the squad search, TOPSIS scoring, the endpoint functions, match
+prediction, training and process_data.py directly. The load test drives the FastAPI
+app in-process over ASGI with concurrent requests and reports throughput and p50/p95/p99
+latency. Results can be saved as a baseline and later runs compared against it:
+
+    python benchmark.py --save-baseline      # record benchmark_baseline.json
+    python benchmark.py --compare            # exit 1 if anything regressed past --tolerance
+
+Handlers run in the server's thread pool (WORKER_PROCESSES=0) so the fixtures patched
+into app's globals are the ones being served.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+os.environ.setdefault("WORKER_PROCESSES", "0")
+
+import httpx
+import numpy as np
+
+import app
+import bench_fixtures
+import process_data
+from innings_simulator import InningsSimulator
+from ml_predictor import MatchPredictor
+from squad_optimizer import SquadConstraints, constrained_top_k_squads, top_k_squads
+from topsis import normalize_decision_matrix, topsis_scores
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+
+def bench(fn: Callable, repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Time `repeat` calls of fn (after `warmup` untimed ones) with its output silenced"""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            fn()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(timings), 4),
+        "median_ms": round(statistics.median(timings), 4),
+        "mean_ms": round(statistics.fmean(timings), 4),
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else float('nan')
+
+
+def setup_fixtures(directory: str, args) -> Dict[str, Any]:
+    """Write the fixtures, train models on them and point app's globals at them"""
+    start = time.perf_counter()
+    paths = bench_fixtures.write_fixtures(
+        directory, candidates_per_position=args.candidates, n_matches=args.matches,
+        n_stats_players=args.stats_players, stats_prefixes=list(app.player_type_map.values()),
+        stats_suffixes=list(app.season_map.values()),
+    )
+    models_dir = os.path.join(directory, 'models')
+    os.makedirs(models_dir, exist_ok=True)
+
+    predictor = MatchPredictor()
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_total = predictor.load_data(paths['ball_by_ball'])
+        predictor.train_models(df_total)
+    predictor.save_models(os.path.join(models_dir, 'player_model.json'), os.path.join(models_dir, 'agg_model.json'))
+
+    app.excel_file_path = paths['teams']
+    app.stats_dir = paths['stats_dir']
+    app.ball_by_ball_path = paths['ball_by_ball']
+    app.player_model_path = os.path.join(models_dir, 'player_model.json')
+    app.agg_model_path = os.path.join(models_dir, 'agg_model.json')
+    app.feature_store_path = os.path.join(models_dir, 'feature_store.joblib')
+    app.innings_simulator_path = os.path.join(models_dir, 'innings_simulator.joblib')
+    app.state_snapshot_path = os.path.join(models_dir, 'startup_state.snapshot')
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.load_state()
+
+    print(f"Fixtures: {args.matches} matches, {args.candidates} candidates per position, "
+          f"{args.stats_players} stats rows ({time.perf_counter() - start:.1f}s)")
+    return {**paths, 'trainer': predictor, 'df_total': df_total, 'directory': directory}
+
+
+def lineup(predictor: MatchPredictor, offset: int = 0) -> List[str]:
+    players = list(predictor.player_index)
+    return [players[(offset + i) % len(players)] for i in range(11)]
+
+
+def run_microbenchmarks(fixtures: Dict[str, Any], args) -> Dict[str, Dict[str, float]]:
+    predictor = app.match_predictor
+    venue = sorted(predictor.venue_lookup)[0]
+    team = app.get_team_arrays('CSK')
+    scores = app.topsis_store.scores('CSK', team, team.decision_matrix, 0.7, 0.3)
+    norm = normalize_decision_matrix(team.decision_matrix)
+    simulator: InningsSimulator = app.innings_simulator
+    lineups = [lineup(predictor, i) for i in range(100)]
+    match_request = app.MatchPredictionRequest(
+        players=lineups[0], venue=venue, batting_team='MI', bowling_team='CSK', innings=2,
+        current_score=85, balls_left=54, wickets_left=7, current_run_rate=8.2, last_five=44, target=175,
+    )
+    weights = [app.WeightPair(form_weight=i / 50, consistency_weight=1 - i / 50) for i in range(50)]
+    processed_path = os.path.join(fixtures['directory'], 'processed.csv')
+    constraints = SquadConstraints(team, squad_size=15, position_flex=1,
+                                   counts={'overseas': (None, 6), 'Wicketkeeper': (1, None), 'Spin': (2, None)})
+
+    cases = {
+        "squad.top_k_squads": (lambda: top_k_squads(scores, team.overseas, team.keeper, team.slots), args.repeat),
+        "squad.constrained_top_k_squads": (lambda: constrained_top_k_squads(scores, constraints), args.repeat),
+        "squad.topsis_scores": (lambda: topsis_scores(norm, np.array([0.7, 0.3])), args.repeat),
+        "endpoint.generate_squad": (lambda: app.generate_squad(app.SquadRequest(team_name='CSK')), args.repeat),
+        "endpoint.generate_squad_batch_50": (
+            lambda: app.generate_squad_batch(app.SquadBatchRequest(team_name='MI', weights=weights)), args.repeat),
+        "endpoint.get_player_stats": (
+            lambda: app.get_player_stats(app.PlayerStatsRequest(player_type='Batsman', season='overall')), args.repeat),
+        "stats.query_page": (
+            lambda: app.get_stats_table(app.resolve_player_stats_request(
+                app.PlayerStatsRequest(player_type='Bowler', season='overall'))).query(
+                columns=['Player', 'Runs', 'SR'], filters={'Runs': {'min': 500}}, sort_by='SR',
+                descending=True, page=1, page_size=20), args.repeat),
+        "endpoint.predict_match": (lambda: app.predict_match(match_request), args.repeat),
+        "predictor.predict_innings": (
+            lambda: predictor.predict_innings(lineups[0], venue, 'MI', 'CSK', 1), args.repeat),
+        "predictor.predict_innings_batch_100": (
+            lambda: predictor.predict_innings_batch(lineups, [venue] * 100, [1] * 100), args.repeat),
+        "simulator.simulate_full_innings": (lambda: simulator.simulate(n_simulations=app.SIMULATIONS), args.repeat),
+    }
+    if not args.skip_train:
+        cases["predictor.train_models"] = (
+            lambda: fixtures['trainer'].train_models(fixtures['df_total']), args.slow_repeat)
+        cases["process_data.main"] = (
+            lambda: process_data.main(fixtures['ball_by_ball'], processed_path), args.slow_repeat)
+
+    results = {}
+    for name, (fn, repeat) in cases.items():
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        results[name] = bench(fn, repeat)
+        r = results[name]
+        print(f"  {name:<38} median {r['median_ms']:10.3f} ms   min {r['min_ms']:10.3f} ms   ({repeat} runs)")
+    return results
+
+
+async def load_test(path: str, concurrency: int, requests: int, method: str = 'POST',
+                    json_body: Optional[Dict] = None, params: Optional[Dict] = None) -> Dict[str, float]:
+    """Send `requests` requests with `concurrency` in flight over ASGI and summarize latencies"""
+    latencies: List[float] = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.request(method, path, json=json_body, params=params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests / wall, 2),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+async def run_load_tests(args) -> Dict[str, Dict[str, float]]:
+    # One event loop for every scenario: the endpoint limits' semaphores bind to the loop they wait on
+    predictor = app.match_predictor
+    scenarios = {
+        "POST /api/generate-squad": dict(path="/api/generate-squad", json_body={"team_name": "CSK"}),
+        "GET /api/player-stats": dict(
+            path="/api/player-stats", method="GET",
+            params={"player_type": "Batsman", "season": "overall", "sort_by": "Runs", "page_size": 20}),
+        "POST /api/predict-match": dict(path="/api/predict-match", json_body={
+            "players": lineup(predictor), "venue": sorted(predictor.venue_lookup)[0],
+            "batting_team": "MI", "bowling_team": "CSK", "innings": 1,
+            "current_score": 60, "balls_left": 72, "wickets_left": 8, "current_run_rate": 7.5,
+        }),
+    }
+    results = {}
+    for name, scenario in scenarios.items():
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        r = await load_test(concurrency=args.concurrency, requests=args.requests, **scenario)
+        results[name] = r
+        print(f"  {name:<28} {r['throughput_rps']:8.1f} req/s   p50 {r['p50_ms']:8.2f} ms   "
+              f"p95 {r['p95_ms']:8.2f} ms   p99 {r['p99_ms']:8.2f} ms   errors {r['errors']}")
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> int:
+    """Print changes against the baseline and return the number of regressions"""
+    regressions = 0
+    print(f"\nAgainst baseline (tolerance {tolerance:.0%}):")
+    checks = [('micro', 'median_ms'), ('load', 'p95_ms')]
+    for section, metric in checks:
+        for name, current in results.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name)
+            if previous is None:
+                print(f"  {name:<38} new")
+                continue
+            ratio = current[metric] / previous[metric] if previous[metric] else float('inf')
+            regressed = ratio > 1 + tolerance or current.get('errors', 0) > previous.get('errors', 0)
+            regressions += regressed
+            flag = "REGRESSION" if regressed else ""
+            print(f"  {name:<38} {metric} {previous[metric]:10.3f} -> {current[metric]:10.3f}  x{ratio:5.2f}  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the squad, stats and prediction hot paths")
+    parser.add_argument('--dir', help="fixture directory (a temporary one by default)")
+    parser.add_argument('--candidates', type=int, default=3, help="team sheet candidates per position")
+    parser.add_argument('--matches', type=int, default=300, help="synthetic ball-by-ball matches")
+    parser.add_argument('--stats-players', type=int, default=200, help="rows per stats workbook")
+    parser.add_argument('--repeat', type=int, default=30, help="runs per microbenchmark")
+    parser.add_argument('--slow-repeat', type=int, default=3, help="runs for training and process_data")
+    parser.add_argument('--requests', type=int, default=200, help="requests per load test scenario")
+    parser.add_argument('--concurrency', type=int, default=8, help="requests in flight during load tests")
+    parser.add_argument('--only', nargs='*', help="run only benchmarks whose name contains one of these")
+    parser.add_argument('--skip-train', action='store_true', help="skip the training and process_data runs")
+    parser.add_argument('--skip-load', action='store_true', help="skip the HTTP load tests")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--compare', action='store_true', help="compare against the baseline, exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before a regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = setup_fixtures(args.dir or tmp, args)
+
+        print("\nMicrobenchmarks:")
+        results = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "fixtures": {"candidates": args.candidates, "matches": args.matches,
+                             "stats_players": args.stats_players},
+            },
+            "micro": run_microbenchmarks(fixtures, args),
+        }
+        if not args.skip_load:
+            print(f"\nLoad tests ({args.requests} requests, concurrency {args.concurrency}):")
+            results["load"] = asyncio.run(run_load_tests(args))
+
+    regressions = 0
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            raise SystemExit(f"No baseline at {args.baseline}; run with --save-baseline first")
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+    if regressions:
+        raise SystemExit(f"{regressions} benchmark(s) regressed")
+
+
+if __name__ == '__main__':
+    main()
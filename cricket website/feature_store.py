@@ -0,0 +1,273 @@
+"""
+Columnar Parquet copies of the project's CSV and Excel inputs.
+
+`python feature_store.py` converts the ball-by-ball CSVs and every workbook under the
+data directories into typed, zstd-compressed Parquet below feature_store/. The loaders
+take the original source path, read the Parquet copy when it is at least as new as the
+source (only the requested columns, memory-mapped) and otherwise fall back to parsing
+the source, so callers work the same whether or not the conversion has been run: a
+Parquet read returns the same columns, dtypes and values as parsing the source would.
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional; loaders fall back to the sources
+    pa = None
+    pq = None
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+FEATURE_STORE_DIR = os.path.join(PROJECT_ROOT, 'feature_store')
+
+# Sources converted by convert_all, relative to PROJECT_ROOT
+CSV_SOURCES = ['all_matches.csv', os.path.join('cricket website', 'ProcessedDataInningsIPL.csv')]
+WORKBOOK_SOURCES = ['ipl_correct_one.xlsx', 'venue.xlsx']
+WORKBOOK_DIRS = [
+    os.path.join('codes', 'Consistency'),
+    os.path.join('codes', 'Form'),
+    'all seasons',
+    'lastseason',
+    os.path.join('cricsquad', 'public', 'stats'),
+]
+
+COMPRESSION = 'zstd'
+
+# Per-workbook file listing sheet names (in workbook order) and their Parquet files
+SHEET_INDEX = '_sheets.json'
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def store_path(source_path: str, store_dir: str = FEATURE_STORE_DIR) -> str:
+    """Location of a source's Parquet copy: a .parquet file for CSVs, a directory for workbooks"""
+    source_path = os.path.abspath(source_path)
+    if source_path.startswith(PROJECT_ROOT + os.sep):
+        rel = os.path.relpath(source_path, PROJECT_ROOT)
+    else:
+        rel = os.path.join('external', os.path.basename(source_path))
+    stem, ext = os.path.splitext(rel)
+    if ext.lower() == '.csv':
+        return os.path.join(store_dir, stem + '.parquet')
+    return os.path.join(store_dir, stem)
+
+
+def _is_fresh(target: str, source_path: str) -> bool:
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source_path)
+
+
+# Schema metadata key recording what _encode changed; copies without it predate the
+# encoding and are treated as stale
+METADATA_KEY = b'feature_store'
+
+# Python types that may appear in an object column, tagged so reads restore them
+_VALUE_TYPES = {
+    'str': (str, str),
+    'int': (int, int),
+    'float': (float, float),
+    'bool': (bool, lambda v: v == 'True'),
+    'timestamp': (pd.Timestamp, pd.Timestamp),
+    'datetime': (datetime.datetime, datetime.datetime.fromisoformat),
+    'date': (datetime.date, datetime.date.fromisoformat),
+    'time': (datetime.time, datetime.time.fromisoformat),
+}
+_VALUE_TAGS = {t: tag for tag, (t, _) in _VALUE_TYPES.items()}
+
+# Column label types restored on read (Excel headers can be numbers)
+_LABEL_TYPES = {'str': str, 'int': int, 'float': float, 'bool': bool}
+
+
+def _encode_value(v) -> Optional[str]:
+    if pd.isna(v):
+        return None
+    tag = _VALUE_TAGS.get(type(v))
+    if tag is None:
+        raise TypeError(f"Cannot store {type(v).__name__} value {v!r} in Parquet")
+    text = v.isoformat() if tag in ('timestamp', 'datetime', 'date', 'time') else repr(v) if tag == 'float' else str(v)
+    return f"{tag}:{text}"
+
+
+def _decode_value(v):
+    if v is None:
+        return np.nan
+    tag, text = v.split(':', 1)
+    return _VALUE_TYPES[tag][1](text)
+
+
+def _encode(df: pd.DataFrame):
+    """
+    Arrow table for a frame, with every object column (e.g. "109*" next to 87 in HS) stored
+    as type-tagged strings and non-string column labels (lastseason's 0) recorded, so that
+    _decode returns exactly the frame pandas read from the source.
+    """
+    labels = [[type(c).__name__, c] for c in df.columns]
+    if any(t not in _LABEL_TYPES for t, _ in labels):
+        raise TypeError(f"Cannot store column labels {list(df.columns)!r} in Parquet")
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    encoded = [c for c in df.columns if df[c].dtype == object]
+    for col in encoded:
+        df[col] = pd.array([_encode_value(v) for v in df[col]], dtype=object)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = {'labels': labels, 'encoded': encoded}
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), METADATA_KEY: json.dumps(meta)})
+
+
+def _decode(table) -> Optional[pd.DataFrame]:
+    """Inverse of _encode; None for copies written without its metadata"""
+    meta = (table.schema.metadata or {}).get(METADATA_KEY)
+    if meta is None:
+        return None
+    meta = json.loads(meta)
+    df = table.to_pandas()
+    for col in meta['encoded']:
+        if col in df.columns:
+            df[col] = pd.array([_decode_value(v) for v in table.column(col).to_pylist()], dtype=object)
+    # Projections come back in source column order, as read_excel/read_csv return them
+    labels = {str(c): _LABEL_TYPES[t](c) for t, c in meta['labels']}
+    df = df[[c for c in labels if c in df.columns]]
+    df.columns = [labels[c] for c in df.columns]
+    return df
+
+
+def _write_parquet(df: pd.DataFrame, target: str):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = target + '.tmp'
+    pq.write_table(_encode(df), tmp, compression=COMPRESSION)
+    os.replace(tmp, target)
+
+
+def convert_csv(source_path: str, store_dir: str = FEATURE_STORE_DIR, force: bool = False) -> Optional[str]:
+    target = store_path(source_path, store_dir)
+    if not force and _is_fresh(target, source_path):
+        return None
+    _write_parquet(pd.read_csv(source_path), target)
+    return target
+
+
+def convert_workbook(source_path: str, store_dir: str = FEATURE_STORE_DIR, force: bool = False) -> Optional[str]:
+    target = store_path(source_path, store_dir)
+    index_path = os.path.join(target, SHEET_INDEX)
+    if not force and _is_fresh(index_path, source_path):
+        return None
+    sheets = pd.read_excel(source_path, sheet_name=None)
+    index = []
+    for i, (name, df) in enumerate(sheets.items()):
+        file_name = f"{i:03d}.parquet"
+        _write_parquet(df, os.path.join(target, file_name))
+        index.append({'sheet': name, 'file': file_name})
+    # The index is written last, so a fresh index means every sheet file is complete
+    with open(index_path, 'w') as f:
+        json.dump(index, f)
+    return target
+
+
+def _workbook_index(source_path: str) -> Optional[List[Dict[str, str]]]:
+    if not parquet_available():
+        return None
+    target = store_path(source_path)
+    index_path = os.path.join(target, SHEET_INDEX)
+    if not _is_fresh(index_path, source_path):
+        return None
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def _read_parquet(path: str, columns: Optional[List] = None) -> Optional[pd.DataFrame]:
+    """Decoded frame of a Parquet copy, or None when it predates the current encoding"""
+    if columns is not None:
+        columns = [str(c) for c in columns]
+    return _decode(pq.read_table(path, columns=columns, memory_map=True))
+
+
+def read_table(source_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a CSV source, from its Parquet copy when fresh, loading only `columns`"""
+    target = store_path(source_path)
+    if parquet_available() and _is_fresh(target, source_path):
+        df = _read_parquet(target, columns)
+        if df is not None:
+            return df
+    return pd.read_csv(source_path, usecols=columns)
+
+
+def read_arrow(source_path: str, columns: Optional[List[str]] = None):
+    """
+    Memory-mapped Arrow table for a converted CSV source (requires a fresh Parquet copy).
+    Object columns are returned in their stored, type-tagged form; see _encode.
+    """
+    target = store_path(source_path)
+    if not parquet_available() or not _is_fresh(target, source_path):
+        raise FileNotFoundError(f"No up-to-date Parquet copy of {source_path}; run feature_store.py")
+    return pq.read_table(target, columns=columns, memory_map=True)
+
+
+def read_sheet(source_path: str, sheet_name=0, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read one workbook sheet (by name or position), from its Parquet copy when fresh"""
+    index = _workbook_index(source_path)
+    if index is not None:
+        if isinstance(sheet_name, int):
+            entry = index[sheet_name] if sheet_name < len(index) else None
+        else:
+            entry = next((e for e in index if e['sheet'] == sheet_name), None)
+        if entry is None:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        df = _read_parquet(os.path.join(store_path(source_path), entry['file']), columns)
+        if df is not None:
+            return df
+    return pd.read_excel(source_path, sheet_name=sheet_name, usecols=columns)
+
+
+def read_workbook(source_path: str) -> Dict[str, pd.DataFrame]:
+    """Read every sheet of a workbook, in workbook order"""
+    index = _workbook_index(source_path)
+    if index is not None:
+        target = store_path(source_path)
+        sheets = {e['sheet']: _read_parquet(os.path.join(target, e['file'])) for e in index}
+        if all(df is not None for df in sheets.values()):
+            return sheets
+    return pd.read_excel(source_path, sheet_name=None)
+
+
+def convert_all(store_dir: str = FEATURE_STORE_DIR, force: bool = False):
+    """Convert every known CSV and workbook source that is missing or stale in the store"""
+    sources = [os.path.join(PROJECT_ROOT, p) for p in CSV_SOURCES + WORKBOOK_SOURCES]
+    for d in WORKBOOK_DIRS:
+        for dirpath, _, files in os.walk(os.path.join(PROJECT_ROOT, d)):
+            sources += [os.path.join(dirpath, f) for f in sorted(files) if f.lower().endswith('.xlsx')]
+
+    for source in sources:
+        if not os.path.exists(source):
+            continue
+        start = time.perf_counter()
+        try:
+            if source.lower().endswith('.csv'):
+                target = convert_csv(source, store_dir, force)
+            else:
+                target = convert_workbook(source, store_dir, force)
+        except Exception as e:
+            print(f"Error converting {source}: {str(e)}")
+            continue
+        rel = os.path.relpath(source, PROJECT_ROOT)
+        if target is None:
+            print(f"up to date  {rel}")
+        else:
+            print(f"converted   {rel} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert CSV/Excel inputs to the Parquet feature store")
+    parser.add_argument('--force', action='store_true', help="rewrite copies even when up to date")
+    args = parser.parse_args()
+    if not parquet_available():
+        raise SystemExit("pyarrow is required to build the feature store")
+    convert_all(force=args.force)
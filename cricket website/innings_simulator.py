@@ -0,0 +1,190 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Delivery outcomes: 0-6 runs off a legal ball, a wicket, or an illegal delivery (wide/no-ball)
+# worth one run that doesn't use up a ball
+N_RUN_OUTCOMES = 7
+WICKET = 7
+EXTRA = 8
+N_OUTCOMES = 9
+OUTCOME_RUNS = np.array([0, 1, 2, 3, 4, 5, 6, 0, 1])
+
+# Outcome probabilities are fitted per (phase, wickets lost) bucket
+PHASE_OVERS = [6, 15]        # powerplay 0-5, middle 6-14, death 15-19
+WICKET_BUCKETS = [3, 6]      # 0-2, 3-5 and 6-9 wickets down
+N_PHASES = len(PHASE_OVERS) + 1
+N_WICKET_BUCKETS = len(WICKET_BUCKETS) + 1
+
+# Momentum from the last five overs tilts run outcomes by at most this factor either way
+MAX_MOMENTUM = 1.25
+
+QUANTILES = [10, 25, 50, 75, 90]
+
+# Resolution of the inverse-CDF sampling table; outcome probabilities are exact to 1/SAMPLING_LEVELS
+SAMPLING_LEVELS = 1 << 16
+
+
+def _bucket(over: np.ndarray, wickets_lost: np.ndarray) -> np.ndarray:
+    return np.digitize(over, PHASE_OVERS) * N_WICKET_BUCKETS + np.digitize(wickets_lost, WICKET_BUCKETS)
+
+
+class InningsSimulator:
+    """
+    Monte Carlo simulation of the rest of a T20 innings.
+
+    Ball outcome probabilities come from the ball-by-ball history, bucketed by phase of the
+    innings and wickets lost. simulate() plays out many innings remainders at once as NumPy
+    arrays, one vectorized step per delivery.
+    """
+
+    def __init__(self, probabilities: np.ndarray):
+        # (buckets x outcomes) probabilities
+        self.probabilities = probabilities
+        # Expected runs per delivery in each bucket, for the momentum tilt
+        self.expected_runs = probabilities @ OUTCOME_RUNS
+        # Sampling tables by momentum, which is rounded so they can be reused across requests
+        self._tables: Dict[float, np.ndarray] = {}
+
+        # Offset of each (balls left, wickets lost) state's bucket in a sampling table
+        phase = np.digitize(np.minimum((120 - np.arange(121)) // 6, 19), PHASE_OVERS)
+        self._phase_offset = (phase * N_WICKET_BUCKETS * SAMPLING_LEVELS).astype(np.int32)
+        wickets = np.digitize(np.minimum(np.arange(11), 9), WICKET_BUCKETS)
+        self._wicket_offset = (wickets * SAMPLING_LEVELS).astype(np.int32)
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, smoothing: float = 1.0) -> 'InningsSimulator':
+        """Fit outcome probabilities from raw ball-by-ball rows (all_matches.csv columns)"""
+        df = df[df['innings'].isin([1, 2])]
+        ball = pd.to_numeric(df['ball'], errors='coerce').to_numpy()
+        keep = ~np.isnan(ball)
+        df, ball = df[keep], ball[keep]
+
+        over = ball.astype(np.int64)
+        dismissed = (df['player_dismissed'].notna() & df['player_dismissed'].astype(str).str.strip().ne('')).astype(np.int64)
+        wickets_lost = (dismissed.groupby([df['match_id'], df['innings']]).cumsum() - dismissed).to_numpy()
+        runs = (pd.to_numeric(df['runs_off_bat'], errors='coerce').fillna(0)
+                + pd.to_numeric(df['extras'], errors='coerce').fillna(0)).to_numpy()
+
+        illegal = np.zeros(len(df), dtype=bool)
+        for col in ('wides', 'noballs'):
+            if col in df.columns:
+                illegal |= pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy() > 0
+
+        outcome = np.minimum(runs, 6).astype(np.int64)
+        outcome[illegal] = EXTRA
+        outcome[dismissed.to_numpy() == 1] = WICKET
+
+        bucket = _bucket(np.minimum(over, 19), np.minimum(wickets_lost, 9))
+        n_buckets = N_PHASES * N_WICKET_BUCKETS
+        counts = np.zeros((n_buckets, N_OUTCOMES))
+        np.add.at(counts, (bucket, outcome), 1)
+
+        # Sparse buckets lean on the overall distribution
+        overall = counts.sum(axis=0) + smoothing
+        counts += smoothing * N_OUTCOMES * overall / overall.sum()
+        return cls(counts / counts.sum(axis=1, keepdims=True))
+
+    def save(self, path: str):
+        import joblib
+        joblib.dump({'probabilities': self.probabilities}, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'InningsSimulator':
+        import joblib
+        return cls(joblib.load(path)['probabilities'])
+
+    def _momentum(self, balls_bowled: int, wickets_lost: int, current_run_rate: float, last_five: float) -> float:
+        """Ratio of recent scoring to what the fitted model expects at this stage of the innings"""
+        if balls_bowled <= 0:
+            return 1.0
+        if balls_bowled >= 30 and last_five > 0:
+            recent_per_ball = last_five / 30
+        else:
+            recent_per_ball = current_run_rate / 6
+        if recent_per_ball <= 0:
+            return 1.0
+        over = min(balls_bowled // 6, 19)
+        expected = self.expected_runs[_bucket(np.array([over]), np.array([min(wickets_lost, 9)]))[0]]
+        return round(float(np.clip(recent_per_ball / expected, 1 / MAX_MOMENTUM, MAX_MOMENTUM)), 2)
+
+    def _outcome_table(self, momentum: float) -> np.ndarray:
+        """
+        Inverse-CDF lookup table of SAMPLING_LEVELS outcomes per bucket, so a uniform integer
+        draw maps straight to an outcome. Run outcomes are tilted towards boundaries when
+        momentum > 1 and away from them when it is < 1.
+        """
+        table = self._tables.get(momentum)
+        if table is None:
+            tilt = np.ones(N_OUTCOMES)
+            tilt[:N_RUN_OUTCOMES] = momentum ** (np.arange(N_RUN_OUTCOMES) / 4)
+            probabilities = self.probabilities * tilt
+            cdf = np.cumsum(probabilities / probabilities.sum(axis=1, keepdims=True), axis=1)
+            cdf[:, -1] = 1.0
+            # Every bucket's CDF is shifted by its index so one searchsorted covers all of them
+            n_buckets = len(cdf)
+            shifted_cdf = (cdf + np.arange(n_buckets)[:, None]).ravel()
+            levels = np.arange(n_buckets)[:, None] + (np.arange(SAMPLING_LEVELS) + 0.5) / SAMPLING_LEVELS
+            table = (np.searchsorted(shifted_cdf, levels.ravel(), side='right') % N_OUTCOMES).astype(np.int8)
+            self._tables[momentum] = table
+        return table
+
+    def simulate(self, current_score: float = 0, balls_left: int = 120, wickets_left: int = 10,
+                 current_run_rate: float = 0, last_five: float = 0, target: Optional[float] = None,
+                 n_simulations: int = 20000, seed: Optional[int] = None) -> Dict:
+        """
+        Simulate `n_simulations` remainders of an innings from its current state.
+
+        Returns the mean and quantiles of the final score and, when chasing `target`, the
+        probability of reaching it before balls or wickets run out. 20000 full innings take
+        ~65 ms on one core; in-progress states are proportionally cheaper.
+        """
+        rng = np.random.default_rng(seed)
+        balls_left = int(np.clip(balls_left, 0, 120))
+        wickets_lost0 = int(np.clip(10 - wickets_left, 0, 10))
+
+        momentum = self._momentum(120 - balls_left, wickets_lost0, current_run_rate, last_five)
+        outcome_table = self._outcome_table(momentum)
+        outcome_runs = OUTCOME_RUNS.astype(np.int32)
+        phase_offset, wicket_offset = self._phase_offset, self._wicket_offset
+
+        # Only unfinished simulations are stepped; finished ones are dropped from the state arrays
+        final = np.full(n_simulations, float(current_score))
+        sim = np.arange(n_simulations)
+        runs = np.zeros(n_simulations, dtype=np.int32)
+        wickets_lost = np.full(n_simulations, wickets_lost0, dtype=np.int32)
+        balls = np.full(n_simulations, balls_left, dtype=np.int32)
+        needed = np.inf if target is None else target - current_score
+        if balls_left == 0 or wickets_lost0 >= 10 or needed <= 0:
+            sim, runs, wickets_lost, balls = sim[:0], runs[:0], wickets_lost[:0], balls[:0]
+
+        # Illegal deliveries don't use up a ball, so allow for some beyond balls_left
+        for _ in range(2 * balls_left + 12):
+            if not len(sim):
+                break
+            draw = rng.integers(0, SAMPLING_LEVELS, size=len(sim), dtype=np.int32)
+            outcome = outcome_table[phase_offset[balls] + wicket_offset[wickets_lost] + draw]
+
+            runs += outcome_runs[outcome]
+            wickets_lost += outcome == WICKET
+            balls -= outcome != EXTRA
+
+            done = (balls == 0) | (wickets_lost == 10) | (runs >= needed)
+            if done.any():
+                final[sim[done]] += runs[done]
+                keep = ~done
+                sim, runs, wickets_lost, balls = sim[keep], runs[keep], wickets_lost[keep], balls[keep]
+        final[sim] += runs
+
+        result = {
+            "simulations": n_simulations,
+            "mean_score": round(float(final.mean()), 2),
+            "score_quantiles": {
+                f"p{q}": round(float(v), 2) for q, v in zip(QUANTILES, np.percentile(final, QUANTILES))
+            },
+            "momentum": momentum,
+        }
+        if target is not None:
+            result["win_probability"] = round(float((final >= target).mean()), 4)
+        return result
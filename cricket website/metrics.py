@@ -0,0 +1,230 @@
+"""
+Request metrics, per-stage timings and an opt-in sampling profiler.
+
+Handler code wraps its stages in `stage("topsis")` etc. Inside `collect()` the elapsed
+times are summed per stage; WorkerPool collects them around every call (in whichever
+process ran it) and feeds them to the stage histogram, which `/metrics` renders in the
+Prometheus text format together with request counts and durations.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as FrequencyCounter
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Histogram buckets in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Seconds between profiler samples, and how many finished profiles are kept
+PROFILE_INTERVAL = 0.001
+MAX_PROFILES = 100
+
+# Stage timings of the call in progress, set by collect()
+_stage_times: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar('stage_times', default=None)
+
+# Set by the HTTP middleware for requests that asked to be profiled; the worker pool stores
+# the finished profile's id in it
+profile_request: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar('profile_request', default=None)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = [[0] * len(self.buckets), 0.0, 0]
+                self._values[labels] = entry
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    bucket_labels = _format_labels(self.labels + ('le',), labels + (f"{bound:g}",))
+                    lines.append(f"{self.name}_bucket{bucket_labels} {bucket_count}")
+                inf_labels = _format_labels(self.labels + ('le',), labels + ('+Inf',))
+                lines.append(f"{self.name}_bucket{inf_labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return lines
+
+
+requests_total = Counter('http_requests_total', "HTTP requests by endpoint and status code", ['endpoint', 'status'])
+request_duration = Histogram('http_request_duration_seconds', "HTTP request latency", ['endpoint'])
+stage_duration = Histogram('stage_duration_seconds', "Time spent in each handler stage", ['endpoint', 'stage'])
+
+
+def render(gauges: Optional[Dict[str, Tuple[str, Dict[tuple, float], Sequence[str]]]] = None) -> str:
+    """
+    Every metric in the Prometheus text format. `gauges` maps a metric name to
+    (documentation, {label values: value}, label names) for values read at scrape time.
+    """
+    lines: List[str] = []
+    for metric in (requests_total, request_duration, stage_duration):
+        lines += metric.render()
+    for name, (documentation, values, label_names) in (gauges or {}).items():
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{name}{_format_labels(label_names, labels)} {value:g}")
+    return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as stage `name` of the current collect(); a no-op outside of one"""
+    timings = _stage_times.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def collect() -> Iterator[Dict[str, float]]:
+    """Collect the stage timings of the enclosed call into the yielded dict"""
+    timings: Dict[str, float] = {}
+    token = _stage_times.set(timings)
+    try:
+        yield timings
+    finally:
+        _stage_times.reset(token)
+
+
+def observe_stages(endpoint: str, timings: Dict[str, float]):
+    for name, seconds in timings.items():
+        stage_duration.observe((endpoint, name), seconds)
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a background thread.
+    Cheap enough to leave on for a single request; only used when a request asks for it.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = PROFILE_INTERVAL, max_depth: int = 64):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: FrequencyCounter = FrequencyCounter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start = 0.0
+        self.duration = 0.0
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._start
+
+    def report(self, top: int = 40) -> Dict[str, Any]:
+        """Folded stacks plus the functions that were on the stack (total) or running (self) most"""
+        own: FrequencyCounter = FrequencyCounter()
+        total: FrequencyCounter = FrequencyCounter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return {
+            "duration_ms": round(self.duration * 1000, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            # Functions doing the work first, then the callers that were on the stack longest
+            "functions": [
+                {"function": name, "self": own[name], "total": total[name]}
+                for name in sorted(total, key=lambda name: (own[name], total[name]), reverse=True)[:top]
+            ],
+            "stacks": [{"stack": stack, "count": count} for stack, count in self.stacks.most_common(top)],
+        }
+
+
+_profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def store_profile(endpoint: str, report: Dict[str, Any]) -> str:
+    profile_id = uuid.uuid4().hex[:16]
+    with _profiles_lock:
+        _profiles[profile_id] = {"endpoint": endpoint, **report}
+        while len(_profiles) > MAX_PROFILES:
+            _profiles.popitem(last=False)
+    return profile_id
+
+
+def get_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    with _profiles_lock:
+        return _profiles.get(profile_id)
@@ -0,0 +1,390 @@
+"""
+Form and Consistency scores for every player, computed from the raw season datasets.
+
+Consistency is scored from the all-seasons workbooks and Form from the last-season ones,
+for IPL and SMAT; a player without IPL numbers falls back to their SMAT record. Every
+role (batting, bowling, wicket-keeping, all-rounder) scores a signed feature matrix with
+three weight vectors in one product:
+
+- AHP: the principal eigenvector of the ordered pairwise comparison matrix, with the
+  features listed from most to least important. This matches the weights hard-coded in
+  the codes/ notebooks, except keeper Consistency: that notebook's hybrid cell carries
+  [0.365, 0.261, 0.173, 0.093, 0.068, 0.039] and its final cell scores with the vector
+  an earlier cell labels as PCA, so keepers use ahp_weights(6) for both kinds, as the
+  Form notebook does
+- PCA: absolute PC1 loadings of the standardized features, fitted on that dataset
+- the blend: alpha * AHP + (1 - alpha) * PCA, boosted per feature and renormalized,
+  which gives the Consistency / Form column itself
+
+All-rounders follow AllrounderForm.ipynb for both kinds: the 15 batting and bowling
+features, alpha 0.5, with batting and bowling counting half each. The older
+codes/Consistency/Allrounder.ipynb (one 14-feature AHP, alpha 0.7, its own boosts) is
+not reproduced, so all-rounder Consistency differs from that notebook's scores.
+
+Roles are scored in parallel and the six score columns of every team sheet in
+ipl_correct_one.xlsx are rewritten in place, matched by player name and Type. The
+notebooks scale some scores (keeper Form by 0.68, for one), so each recomputed column is
+first put on the scale the sheets already use, by one factor per role applied to every
+row (see scale_factors). Only players with all six scores are written; the others keep
+their sheet values and are reported as skipped.
+
+    python player_scores.py --workers 4
+"""
+import argparse
+import functools
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import feature_store
+
+PROJECT_ROOT = feature_store.PROJECT_ROOT
+WORKBOOK_PATH = os.path.join(PROJECT_ROOT, 'ipl_correct_one.xlsx')
+
+KINDS = ('Consistency', 'Form')
+LEAGUES = ('IPL', 'SMAT')  # in order of preference
+ROLES = ('batting', 'bowling', 'keeping', 'allrounder')
+
+# Raw workbooks per dataset, kind and league, as globs relative to PROJECT_ROOT (some of
+# the exported file names carry timestamps with non-breaking spaces)
+SOURCES = {
+    'batting': {
+        'Consistency': {'IPL': 'all seasons/batsamset_ipl*.xlsx', 'SMAT': 'all seasons/batsmanset_smat.xlsx'},
+        'Form': {'IPL': 'lastseason/lastseasoniplbatting.xlsx', 'SMAT': 'lastseason/Lastseasonbatsman_smat.xlsx'},
+    },
+    'bowling': {
+        'Consistency': {'IPL': 'all seasons/bowlerset_ipl*.xlsx', 'SMAT': 'all seasons/bowlerset_smat.xlsx'},
+        'Form': {'IPL': 'lastseason/lastseasoniplbowlingg.xlsx', 'SMAT': 'lastseason/lastseasonbowler_smat.xlsx'},
+    },
+    'keeping': {
+        'Consistency': {'IPL': 'all seasons/wicket_keeperset_ipl.xlsx', 'SMAT': 'all seasons/wicket_keeperset_smat.xlsx'},
+        'Form': {'IPL': 'lastseason/lastseasonipl_wk.xlsx', 'SMAT': 'lastseason/lastseasonwicketkeeper_smat.xlsx'},
+    },
+}
+
+# Datasets each role is scored from; all-rounders join their batting and bowling records
+ROLE_DATASETS = {
+    'batting': ('batting',),
+    'bowling': ('bowling',),
+    'keeping': ('keeping',),
+    'allrounder': ('batting', 'bowling'),
+}
+
+# The same statistic is spelled differently across the exports
+COLUMN_ALIASES = {
+    "100's": '100s', '100’s': '100s', "50's": '50s', '50’s': '50s',
+    "0's": 'Zeros', '0’s': 'Zeros', '0': 'Zeros',
+    'Dis': 'Dismissed', 'Ct': 'Catches', 'Catches Taken': 'Catches', 'catches Taken': 'Catches',
+    'St': 'Stumpings', 'MD': 'Max Dis Inns', 'D/I': 'Dis/Inn',
+}
+
+# Signed features of each dataset, most important first (the AHP priority order)
+FEATURES = {
+    'batting': [('Inns_per_Mat', 1), ('NO', 1), ('SR', 1), ('Ave', 1), ('50s100s', 1),
+                ('Runs', 1), ('boundary', 1), ('Zeros', -1)],
+    'bowling': [('Inns_per_Mat', 1), ('Wkts', 1), ('Ave', -1), ('Econ', -1), ('SR_per_100', -1),
+                ('4W5W', 1), ('Mdns', 1)],
+    'keeping': [('Inns_per_Mat', 1), ('Dismissed', 1), ('Catches', 1), ('Stumpings', 1),
+                ('MaxDisInns', 1), ('DisInn', 1)],
+}
+
+# role -> kind -> (alpha, boost factors); features not listed keep a factor of 1
+BLENDS = {
+    'batting': {
+        'Consistency': (0.7, {'SR': 2, 'Ave': 2, '50s100s': 2, 'Runs': 2, 'boundary': 2}),
+        'Form': (0.7, {'SR': 2, 'Ave': 2, '50s100s': 2, 'Runs': 2, 'boundary': 2}),
+    },
+    'bowling': {
+        'Consistency': (0.7, {'Wkts': 2, 'Ave': 2, 'Econ': 2, 'SR_per_100': 2}),
+        'Form': (0.7, {'Wkts': 2, 'Econ': 2}),
+    },
+    'keeping': {
+        'Consistency': (0.7, {'Dismissed': 2, 'Catches': 2, 'Stumpings': 2, 'MaxDisInns': 2}),
+        'Form': (0.7, {'Dismissed': 2, 'Catches': 2, 'Stumpings': 2, 'MaxDisInns': 2}),
+    },
+    'allrounder': {
+        'Consistency': (0.5, {'Bat_SR': 2, 'Bat_Ave': 2, 'Bat_Runs': 2,
+                              'Bowl_Wkts': 3, 'Bowl_Ave': 2, 'Bowl_Econ': 2}),
+        'Form': (0.5, {'Bat_SR': 2, 'Bat_Ave': 2, 'Bat_Runs': 3,
+                       'Bowl_Wkts': 3, 'Bowl_Ave': 2, 'Bowl_Econ': 2}),
+    },
+}
+
+# Team sheet Type -> role whose scores the row gets
+TYPE_ROLES = {'BAT': 'batting', 'BAT,WK': 'batting', 'BOWL': 'bowling', 'AR': 'allrounder', 'WK': 'keeping'}
+
+SCORE_COLUMNS = [f"{kind}{suffix}" for kind in KINDS for suffix in ('_AHP', '_PCA', '')]
+
+
+def ahp_weights(n: int) -> np.ndarray:
+    """
+    Priority vector of n criteria ranked most to least important, where criterion i is
+    (j - i + 1) times as important as criterion j below it
+    """
+    rank = np.arange(n)
+    gap = rank[None, :] - rank[:, None]
+    pairwise = np.where(gap >= 0, gap + 1.0, 1.0 / (1 - np.minimum(gap, 0)))
+    eigenvalues, eigenvectors = np.linalg.eig(pairwise)
+    principal = np.abs(eigenvectors[:, np.argmax(eigenvalues.real)].real)
+    return principal / principal.sum()
+
+
+def pca_weights(X: np.ndarray) -> np.ndarray:
+    """Absolute first principal component loadings of the standardized columns, summing to 1"""
+    std = X.std(axis=0)
+    Z = np.divide(X - X.mean(axis=0), std, out=np.zeros_like(X), where=std > 0)
+    if len(Z) < 2 or not Z.any():
+        return np.full(X.shape[1], 1.0 / X.shape[1])
+    _, _, vt = np.linalg.svd(Z, full_matrices=False)
+    loadings = np.abs(vt[0])
+    return loadings / loadings.sum()
+
+
+def _resolve(pattern: str) -> Optional[str]:
+    matches = sorted(glob.glob(os.path.join(PROJECT_ROOT, pattern)))
+    return matches[0] if matches else None
+
+
+def _numeric(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[column], errors='coerce').astype(float)
+
+
+def _per(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+    return (numerator / denominator.where(denominator > 0)).fillna(0.0)
+
+
+def _balls(overs: pd.Series) -> pd.Series:
+    # Overs are written as overs.balls, e.g. 586.5
+    whole = np.floor(overs)
+    return whole * 6 + ((overs - whole) * 10).round()
+
+
+def dataset_features(dataset: str, raw: pd.DataFrame) -> pd.DataFrame:
+    """The signed-feature inputs of `dataset` for every player in a raw export, indexed by Player"""
+    raw = raw.rename(columns=lambda c: COLUMN_ALIASES.get(str(c).strip(), str(c).strip()))
+    raw = raw.dropna(subset=['Player'])
+    raw = raw.assign(Player=raw['Player'].astype(str).str.strip(), Mat=_numeric(raw, 'Mat'))
+    # A player listed twice keeps the record with the most matches
+    raw = raw.sort_values('Mat', ascending=False, kind='stable').drop_duplicates('Player')
+    col = lambda name: _numeric(raw, name)
+
+    features = pd.DataFrame(index=pd.Index(raw['Player'], name='Player'))
+    features['Inns_per_Mat'] = _per(col('Inns'), col('Mat')).to_numpy()
+    if dataset == 'batting':
+        for name in ('NO', 'SR', 'Ave', 'Runs', 'Zeros'):
+            features[name] = col(name).to_numpy()
+        features['50s100s'] = (col('50s') + 2 * col('100s')).to_numpy()
+        features['boundary'] = (col('4s') + col('6s')).to_numpy()
+    elif dataset == 'bowling':
+        runs = col('Runs')
+        # Without a wicket the average and strike rate are undefined ("-"); charge the
+        # bowler as if the next ball took one rather than scoring them as 0
+        features['Wkts'] = col('Wkts').to_numpy()
+        features['Ave'] = col('Ave').fillna(runs).to_numpy()
+        features['Econ'] = col('Econ').to_numpy()
+        features['SR_per_100'] = (col('SR').fillna(_balls(col('Overs')) + 1) / 100).to_numpy()
+        features['4W5W'] = (col('4W') + 1.25 * col('5W')).to_numpy()
+        features['Mdns'] = col('Mdns').to_numpy()
+    else:
+        for name in ('Dismissed', 'Catches', 'Stumpings'):
+            features[name] = col(name).to_numpy()
+        # "4 (4ct 0st)" -> 4
+        best = raw['Max Dis Inns'] if 'Max Dis Inns' in raw else pd.Series('', index=raw.index)
+        features['MaxDisInns'] = pd.to_numeric(best.astype(str).str.extract(r'^\s*(\d+)')[0], errors='coerce').to_numpy()
+        features['DisInn'] = col('Dis/Inn').to_numpy()
+    return features.fillna(0.0).replace([np.inf, -np.inf], 0.0)
+
+
+def score(features: pd.DataFrame, signs: np.ndarray, alpha: float, boosts: Dict[str, float],
+          blocks: Optional[List[np.ndarray]] = None) -> pd.DataFrame:
+    """
+    AHP, PCA and blended scores of every row of `features` (columns in AHP priority order).
+    With `blocks` (boolean column masks) each block gets an equal share of the blended
+    weights, so an all-rounder's batting and bowling count half each.
+    """
+    X = features.to_numpy(dtype=float)
+    ahp = ahp_weights(X.shape[1])
+    pca = pca_weights(X)
+    blend = (alpha * ahp + (1 - alpha) * pca) * np.array([boosts.get(c, 1.0) for c in features.columns])
+    blocks = blocks or [np.ones(len(blend), dtype=bool)]
+    for block in blocks:
+        blend[block] /= blend[block].sum() * len(blocks)
+    # The AHP and PCA scores of a blocked role are the mean of its per-block scores
+    weights = np.column_stack([ahp / len(blocks), pca / len(blocks), blend])
+    scores = X @ (weights * signs[:, None])
+    return pd.DataFrame(scores, index=features.index, columns=['AHP', 'PCA', 'Score'])
+
+
+# All-rounders re-use the batting and bowling exports, so each is parsed once per process
+@functools.lru_cache(maxsize=None)
+def _read(pattern: str) -> Optional[pd.DataFrame]:
+    path = _resolve(pattern)
+    if path is None:
+        print(f"Missing source {pattern}")
+        return None
+    return feature_store.read_sheet(path, 0)
+
+
+def role_features(role: str, kind: str, league: str) -> Tuple[Optional[pd.DataFrame], np.ndarray]:
+    """Feature matrix (indexed by player) and feature signs of one role's kind/league dataset"""
+    frames, signs = [], []
+    for dataset in ROLE_DATASETS[role]:
+        raw = _read(SOURCES[dataset][kind][league])
+        if raw is None:
+            return None, np.array([])
+        prefix = ('Bat_' if dataset == 'batting' else 'Bowl_') if role == 'allrounder' else ''
+        features = dataset_features(dataset, raw)[[name for name, _ in FEATURES[dataset]]]
+        frames.append(features.add_prefix(prefix))
+        signs += [sign for _, sign in FEATURES[dataset]]
+    # An all-rounder needs both a batting and a bowling record
+    return pd.concat(frames, axis=1, join='inner'), np.array(signs, dtype=float)
+
+
+def score_role(role: str) -> pd.DataFrame:
+    """The six score columns of every player with data for `role`, preferring IPL over SMAT"""
+    columns = []
+    for kind in KINDS:
+        alpha, boosts = BLENDS[role][kind]
+        per_league, seen = [], pd.Index([])
+        for league in LEAGUES:
+            features, signs = role_features(role, kind, league)
+            if features is None or features.empty:
+                continue
+            blocks = None
+            if role == 'allrounder':
+                blocks = [features.columns.str.startswith('Bat_'), features.columns.str.startswith('Bowl_')]
+            scores = score(features, signs, alpha, boosts, blocks)
+            scores = scores[~scores.index.isin(seen)]
+            seen = seen.append(scores.index)
+            per_league.append(scores)
+        combined = pd.concat(per_league) if per_league else pd.DataFrame(columns=['AHP', 'PCA', 'Score'])
+        combined.columns = [f"{kind}_AHP", f"{kind}_PCA", kind]
+        columns.append(combined)
+    return pd.concat(columns, axis=1)
+
+
+def score_all(workers: int = 1) -> Dict[str, pd.DataFrame]:
+    """Scores of every role, computed in a process pool when `workers` > 1"""
+    if workers <= 1:
+        return {role: score_role(role) for role in ROLES}
+    with ProcessPoolExecutor(max_workers=min(workers, len(ROLES))) as pool:
+        return dict(zip(ROLES, pool.map(score_role, ROLES)))
+
+
+def sheet_scores(path: str = WORKBOOK_PATH) -> Dict[str, pd.DataFrame]:
+    """The score columns the team sheets currently hold, per role (one row per sheet row)"""
+    frames = []
+    for df in feature_store.read_workbook(path).values():
+        if not {'Player', 'Type'} <= set(df.columns) or not set(SCORE_COLUMNS) <= set(df.columns):
+            continue
+        df = df.dropna(subset=['Player'])
+        roles = df['Type'].astype(str).str.strip().str.upper().map(TYPE_ROLES)
+        frames.append(df[SCORE_COLUMNS].apply(pd.to_numeric, errors='coerce')
+                      .set_index(df['Player'].astype(str).str.strip()).assign(role=roles.to_numpy()))
+    current = pd.concat(frames) if frames else pd.DataFrame(columns=SCORE_COLUMNS + ['role'])
+    return {role: current[current['role'] == role].drop(columns='role') for role in ROLES}
+
+
+def scale_factors(scores: Dict[str, pd.DataFrame], current: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Per role and score column, the factor that puts the recomputed scores on the sheets'
+    scale: the median ratio of sheet value to recomputed value over the players in both
+    (same-sign, non-zero pairs; 1 when there are none). A median keeps a few stale sheet
+    cells from skewing it, and re-running on an updated workbook finds the same factors.
+    """
+    factors = pd.DataFrame(1.0, index=list(ROLES), columns=SCORE_COLUMNS)
+    for role in ROLES:
+        old = current.get(role)
+        new = scores.get(role)
+        if old is None or new is None:
+            continue
+        old = old[old.index.isin(new.index)]
+        new = new.loc[old.index]
+        for column in SCORE_COLUMNS:
+            ratio = (old[column] / new[column]).to_numpy(dtype=float)
+            ratio = ratio[np.isfinite(ratio) & (ratio > 0)]
+            if len(ratio):
+                factors.loc[role, column] = float(np.median(ratio))
+    return factors
+
+
+def rescale(scores: Dict[str, pd.DataFrame], factors: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    return {role: table[SCORE_COLUMNS] * factors.loc[role, SCORE_COLUMNS] for role, table in scores.items()}
+
+
+def write_team_sheets(scores: Dict[str, pd.DataFrame], path: str = WORKBOOK_PATH,
+                      output: Optional[str] = None) -> Dict[str, Dict[str, object]]:
+    """
+    Overwrite the score columns of every sheet in the team workbook for the players with
+    all six scores for their role. Everyone else (and every other cell) is left untouched,
+    so a row never mixes recomputed and old scores. Returns per-sheet counts of updated
+    rows and the players that were skipped.
+    """
+    from openpyxl import load_workbook  # only needed when writing
+
+    workbook = load_workbook(path)
+    report = {}
+    for sheet in workbook.worksheets:
+        header = {str(cell.value).strip(): cell.column for cell in sheet[1] if cell.value is not None}
+        if not {'Player', 'Type'} <= header.keys() or not set(SCORE_COLUMNS) <= header.keys():
+            continue
+        updated, skipped = 0, []
+        for row in range(2, sheet.max_row + 1):
+            player = sheet.cell(row, header['Player']).value
+            if player is None:
+                continue
+            player = str(player).strip()
+            role = TYPE_ROLES.get(str(sheet.cell(row, header['Type']).value).strip().upper())
+            table = scores.get(role)
+            if table is None or player not in table.index or table.loc[player, SCORE_COLUMNS].isna().any():
+                skipped.append(player)
+                continue
+            for column in SCORE_COLUMNS:
+                sheet.cell(row, header[column]).value = float(table.loc[player, column])
+            updated += 1
+        report[sheet.title] = {"updated": updated, "skipped": skipped}
+
+    # Write a sibling file and swap it in, so the server never reads a half-written workbook
+    output = output or path
+    tmp = f"{output}.{os.getpid()}.tmp.xlsx"
+    workbook.save(tmp)
+    os.replace(tmp, output)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute Form/Consistency scores and update the team sheets")
+    parser.add_argument('--workbook', default=WORKBOOK_PATH, help="team workbook to update")
+    parser.add_argument('--output', default=None, help="write the updated workbook here instead of in place")
+    parser.add_argument('--workers', type=int, default=min(len(ROLES), os.cpu_count() or 1),
+                        help="roles scored in parallel")
+    parser.add_argument('--dry-run', action='store_true', help="score every role without writing the workbook")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scores = score_all(args.workers)
+    for role, table in scores.items():
+        print(f"{role:<11} {len(table)} players")
+    print(f"Scored in {time.perf_counter() - start:.2f}s")
+    factors = scale_factors(scores, sheet_scores(args.workbook))
+    print(f"Scale factors to the sheets' scale:\n{factors.round(4).to_string()}")
+    scores = rescale(scores, factors)
+    if args.dry_run:
+        return
+
+    report = write_team_sheets(scores, args.workbook, args.output)
+    for sheet, result in report.items():
+        skipped = f" (skipped, incomplete data: {', '.join(result['skipped'])})" if result['skipped'] else ''
+        print(f"{sheet:<14} {result['updated']} players updated{skipped}")
+    print(f"Wrote {args.output or args.workbook} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,67 +1,248 @@
+import argparse
+import time
+from contextlib import contextmanager
+
 import pandas as pd
 import numpy as np
 
-# Read the data from the correct path
-df = pd.read_csv('../all_matches.csv')
-
-# Process venue
-df['venue'] = df['venue'].fillna(df['venue'].apply(lambda x: x.split(' ')[0] if isinstance(x, str) else x))
-eligible_cites = df['venue'].value_counts()[df['venue'].value_counts() > 100].index.tolist()
-df = df[df['venue'].isin(eligible_cites)]
-
-# Process runs
-df['runs_off_bat'] = pd.to_numeric(df['runs_off_bat'], errors='coerce')
-df['extras'] = pd.to_numeric(df['extras'], errors='coerce')
-df['runs_off_bat'].fillna(0, inplace=True)
-df['extras'].fillna(0, inplace=True)
-
-# Calculate current score
-df['current_score'] = (df['runs_off_bat'] + df['extras']).groupby([df['match_id'], df['innings']]).cumsum()
-
-# Process balls
-df['over'] = df['ball'].apply(lambda x: str(x).split('.')[0])
-df['ball_no'] = df['ball'].apply(lambda x: str(x).split('.')[1])
-df['ball_bowled'] = (df['over'].astype(int)*6 + df['ball_no'].astype(int))
-df['balls_left'] = 120 - df['ball_bowled']
-df['balls_left'] = df['balls_left'].apply(lambda x: 0 if x<0 else x)
-
-# Process wickets
-df['player_dismissed'] = df['player_dismissed'].apply(lambda x: 1 if pd.notna(x) and x.strip() != '' else 0)
-df['cumulative_dismissals'] = df.groupby(['match_id', df['innings'].astype(str)])['player_dismissed'].cumsum()
-df['wicket_left'] = 10 - df['cumulative_dismissals']
-
-# Calculate run rate
-df['current_run_rate'] = (df['current_score']*6) / df['ball_bowled']
-df.loc[df['ball_bowled'] == 0, 'current_run_rate'] = 0
-
-# Calculate total runs
-df['total_runs'] = df['runs_off_bat'] + df['extras']
-df['total_runs_in_innings'] = df.groupby(['match_id', df['innings'].astype(str)])['total_runs'].transform('sum')
-
-# Calculate last five overs runs
-print("Calculating last five overs runs...")
-groups = df.groupby('match_id')
-match_id = df['match_id'].unique()
-last_five = []
-
-for id in match_id:
-    group = groups.get_group(id).dropna(subset=['runs_off_bat'])
-    rolling_sum = group['runs_off_bat'].rolling(window=30, min_periods=1).sum()
-    last_five.extend(rolling_sum.tolist())
-
-df['last_five'] = last_five
-
-# Create final dataframe
-final_df = df[['venue', 'batting_team', 'bowling_team', 'wicket_left', 'balls_left', 
-               'last_five', 'current_score', 'current_run_rate', 'total_runs_in_innings']]
-final_df.dropna(inplace=True)
-
-# Save processed data
-output_path = 'ProcessedDataInningsIPL.csv'
-final_df.to_csv(output_path, index=False)
-print(f"Data processing completed successfully! Saved to {output_path}")
-print(f"Final dataset shape: {final_df.shape}")
-print("\nSample of processed data:")
-print(final_df.head())
-print("\nVenue distribution:")
-print(final_df['venue'].value_counts()) 
\ No newline at end of file
+import feature_store
+
+INPUT_PATH = '../all_matches.csv'
+OUTPUT_PATH = 'ProcessedDataInningsIPL.csv'
+
+# Only the columns the features are derived from are read
+INPUT_COLUMNS = ['match_id', 'venue', 'innings', 'ball', 'batting_team', 'bowling_team',
+                 'runs_off_bat', 'extras', 'player_dismissed']
+INPUT_DTYPES = {
+    'venue': 'category',
+    'batting_team': 'category',
+    'bowling_team': 'category',
+    'ball': 'float64',
+    'player_dismissed': 'object',
+}
+
+OUTPUT_COLUMNS = ['venue', 'batting_team', 'bowling_team', 'wicket_left', 'balls_left',
+                  'last_five', 'current_score', 'current_run_rate', 'total_runs_in_innings']
+
+# Streaming mode reads the CSV as plain strings, since category codes differ between chunks
+STREAM_DTYPES = {col: dtype for col, dtype in INPUT_DTYPES.items() if dtype != 'category'}
+
+# Venues with this many balls or fewer are dropped
+MIN_VENUE_BALLS = 100
+
+# Rows per read_csv chunk in streaming mode
+DEFAULT_CHUNKSIZE = 200_000
+
+# Seconds spent in each stage, filled by stage()
+stage_times = {}
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    yield
+    stage_times[name] = stage_times.get(name, 0.0) + time.perf_counter() - start
+
+
+def print_timings():
+    print("\nStage timings:")
+    for name, seconds in stage_times.items():
+        print(f"  {name:<16} {seconds:8.3f}s")
+    print(f"  {'total':<16} {sum(stage_times.values()):8.3f}s")
+
+
+def load_matches(path):
+    # Served from the Parquet feature store when a fresh copy exists
+    return feature_store.read_table(path, columns=INPUT_COLUMNS).astype(INPUT_DTYPES)
+
+
+def filter_venues(df, eligible_cites=None):
+    # Process venue
+    if eligible_cites is None:
+        eligible_cites = df['venue'].value_counts()[df['venue'].value_counts() > MIN_VENUE_BALLS].index.tolist()
+    df = df[df['venue'].isin(eligible_cites)].copy()
+    if isinstance(df['venue'].dtype, pd.CategoricalDtype):
+        df['venue'] = df['venue'].cat.remove_unused_categories()
+    return df
+
+
+def add_features(df, float_runs=False):
+    """
+    Derive the per-ball innings state features from the raw ball-by-ball rows.
+
+    float_runs forces float run columns, so chunks of a streamed file are written with
+    the same number format the whole file would get.
+    """
+    innings_keys = [df['match_id'], df['innings']]
+
+    with stage('runs'):
+        # Process runs
+        df['runs_off_bat'] = pd.to_numeric(df['runs_off_bat'], errors='coerce').fillna(0)
+        df['extras'] = pd.to_numeric(df['extras'], errors='coerce').fillna(0)
+        if float_runs:
+            df[['runs_off_bat', 'extras']] = df[['runs_off_bat', 'extras']].astype('float64')
+        df['total_runs'] = df['runs_off_bat'] + df['extras']
+
+        # Calculate current score
+        df['current_score'] = df['total_runs'].groupby(innings_keys).cumsum()
+
+    with stage('balls'):
+        # Process balls: "over.ball" split numerically
+        over = df['ball'].to_numpy().astype(np.int64)
+        ball_no = np.rint((df['ball'].to_numpy() - over) * 10).astype(np.int64)
+        df['ball_bowled'] = over * 6 + ball_no
+        df['balls_left'] = (120 - df['ball_bowled']).clip(lower=0)
+
+    with stage('wickets'):
+        # Process wickets
+        dismissed = df['player_dismissed']
+        df['player_dismissed'] = (dismissed.notna() & dismissed.astype(str).str.strip().ne('')).astype(np.int64)
+        df['cumulative_dismissals'] = df['player_dismissed'].groupby(innings_keys).cumsum()
+        df['wicket_left'] = 10 - df['cumulative_dismissals']
+
+    with stage('run_rate'):
+        # Calculate run rate
+        df['current_run_rate'] = (df['current_score'] * 6) / df['ball_bowled']
+        df.loc[df['ball_bowled'] == 0, 'current_run_rate'] = 0
+
+        # Calculate total runs
+        df['total_runs_in_innings'] = df['total_runs'].groupby(innings_keys).transform('sum')
+
+    with stage('last_five'):
+        # Runs off the bat over the last 30 balls of the match. The grouped result comes back
+        # in first-appearance order of match_id, the order rows were historically laid out in.
+        rolling_sum = (
+            df.groupby('match_id', sort=False)['runs_off_bat']
+            .rolling(window=30, min_periods=1)
+            .sum()
+        )
+        df['last_five'] = rolling_sum.to_numpy()
+
+    return df
+
+
+def scan_matches(path, chunksize):
+    """
+    First streaming pass: ball counts per venue and whether any run value parses as a float
+    (missing or fractional), which makes the whole column float in the in-memory pipeline.
+    """
+    venue_counts = pd.Series(dtype='int64')
+    float_runs = False
+    for chunk in pd.read_csv(path, usecols=['venue', 'runs_off_bat', 'extras'],
+                             dtype={'venue': 'object'}, chunksize=chunksize):
+        venue_counts = venue_counts.add(chunk['venue'].value_counts(), fill_value=0)
+        for col in ('runs_off_bat', 'extras'):
+            values = pd.to_numeric(chunk[col], errors='coerce')
+            float_runs = float_runs or values.dtype.kind == 'f'
+    eligible_cites = venue_counts[venue_counts > MIN_VENUE_BALLS].index.tolist()
+    return eligible_cites, float_runs
+
+
+def iter_match_blocks(path, chunksize):
+    """
+    Yield DataFrames holding only complete matches.
+
+    The trailing match of every chunk is carried over and prepended to the next one, so
+    per-(match_id, innings) state - running score, dismissals and the 30 ball window - is
+    never split. Rows of a match must be contiguous, as in cricsheet exports; a match that
+    reappears after its block was emitted raises ValueError.
+    """
+    carry = None
+    emitted = set()
+    for chunk in pd.read_csv(path, usecols=INPUT_COLUMNS, dtype=STREAM_DTYPES, chunksize=chunksize):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        ids = chunk['match_id'].to_numpy()
+        other = np.flatnonzero(ids != ids[-1])
+        split = other[-1] + 1 if len(other) else 0
+        block, carry = chunk.iloc[:split], chunk.iloc[split:]
+        if len(block):
+            block_ids = ids[:split]
+            run_ids = block_ids[np.r_[True, block_ids[1:] != block_ids[:-1]]]
+            if len(set(run_ids)) != len(run_ids) or emitted.intersection(run_ids):
+                raise ValueError("Streaming mode needs the rows of each match to be contiguous")
+            emitted.update(run_ids)
+            yield block
+    if carry is not None and len(carry):
+        if carry['match_id'].iloc[0] in emitted:
+            raise ValueError("Streaming mode needs the rows of each match to be contiguous")
+        yield carry
+
+
+def main_streaming(input_path=INPUT_PATH, output_path=OUTPUT_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Process the CSV in match-aligned chunks, appending to the output as it goes.
+
+    Peak memory is bounded by the chunk size rather than the input size, and the output is
+    byte-identical to main() for inputs whose matches are stored contiguously.
+    """
+    with stage('scan'):
+        eligible_cites, float_runs = scan_matches(input_path, chunksize)
+
+    rows = 0
+    first = True
+    blocks = iter_match_blocks(input_path, chunksize)
+    while True:
+        with stage('read'):
+            block = next(blocks, None)
+        if block is None:
+            break
+        with stage('filter_venues'):
+            block = filter_venues(block, eligible_cites)
+        if block.empty:
+            continue
+        block = add_features(block, float_runs=float_runs)
+        with stage('write'):
+            final_block = block[OUTPUT_COLUMNS].dropna()
+            final_block.to_csv(output_path, index=False, header=first, mode='w' if first else 'a')
+        rows += len(final_block)
+        first = False
+
+    if first:
+        # No eligible rows at all: still write the header
+        pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(output_path, index=False)
+
+    print(f"Data processing completed successfully! Saved to {output_path}")
+    print(f"Final dataset rows: {rows}")
+    print_timings()
+
+
+def main(input_path=INPUT_PATH, output_path=OUTPUT_PATH):
+    with stage('read'):
+        df = load_matches(input_path)
+
+    with stage('filter_venues'):
+        df = filter_venues(df)
+
+    df = add_features(df)
+
+    with stage('write'):
+        # Create final dataframe
+        final_df = df[OUTPUT_COLUMNS].dropna()
+
+        # Save processed data
+        final_df.to_csv(output_path, index=False)
+
+    print(f"Data processing completed successfully! Saved to {output_path}")
+    print(f"Final dataset shape: {final_df.shape}")
+    print("\nSample of processed data:")
+    print(final_df.head())
+    print("\nVenue distribution:")
+    print(final_df['venue'].value_counts())
+    print_timings()
+    return final_df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build ProcessedDataInningsIPL.csv from ball-by-ball data")
+    parser.add_argument('--input', default=INPUT_PATH)
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--stream', action='store_true',
+                        help="process the input in match-aligned chunks with bounded memory")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="rows per chunk in streaming mode")
+    args = parser.parse_args()
+    if args.stream:
+        main_streaming(args.input, args.output, args.chunksize)
+    else:
+        main(args.input, args.output)
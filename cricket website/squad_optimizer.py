@@ -0,0 +1,304 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Role codes used in TeamArrays.role
+ROLE_BAT, ROLE_BOWL, ROLE_AR, ROLE_WK, ROLE_OTHER = range(5)
+
+# Display role for each role code; types that aren't BAT/BOWL/AR/WK are shown as allrounders
+ROLE_NAMES = ["Batsman", "Bowler", "Allrounder", "Wicketkeeper", "Allrounder"]
+
+# Seconds HiGHS may spend on one solve of the constrained search
+SOLVER_TIME_LIMIT = 10.0
+
+# scipy.optimize.milp statuses: solved to optimality, and no further feasible squad
+MILP_OPTIMAL, MILP_INFEASIBLE = 0, 2
+
+
+class SolverLimitError(RuntimeError):
+    """The constrained search stopped (e.g. at SOLVER_TIME_LIMIT) without proving a squad optimal"""
+
+
+class TeamArrays:
+    """A team sheet compiled into flat NumPy arrays, one entry per player row"""
+
+    def __init__(self, df: pd.DataFrame, positions: Sequence[int] = range(1, 12)):
+        nationality = df['Nationality'].astype(str).str.strip().str.lower().to_numpy()
+        player_type = df['Type'].astype(str).to_numpy()
+        keeper = np.array(['WK' in t for t in player_type], dtype=bool)
+
+        self.positions = list(positions)
+        self.position = df['Position'].to_numpy()
+        self.form = df['Form'].to_numpy(dtype=float)
+        self.consistency = df['Consistency'].to_numpy(dtype=float)
+        self.overseas = nationality == 'foreginer'
+        self.indian = nationality == 'indian'
+        self.keeper = keeper
+        self.role = np.select(
+            [keeper, player_type == 'BAT', player_type == 'BOWL', player_type == 'AR'],
+            [ROLE_WK, ROLE_BAT, ROLE_BOWL, ROLE_AR],
+            default=ROLE_OTHER,
+        ).astype(np.int8)
+        self.names = df['Player'].tolist()
+        self.bowler_types = [None if pd.isna(b) else b for b in df['Bowler_Type']]
+        # Row indices of the candidates for each batting position, in sheet order
+        self.slots = [np.flatnonzero(self.position == pos) for pos in self.positions]
+
+    def group(self, name: str) -> np.ndarray:
+        """
+        Rows belonging to a named group, for squad count rules: "overseas", "indian", a role
+        ("Batsman", "Bowler", "Allrounder", "Wicketkeeper"), "bowling_option" (anyone with a
+        Bowler_Type) or a Bowler_Type value such as "Pace" or "Spin".
+        """
+        key = name.strip().lower()
+        if key == 'overseas':
+            return self.overseas
+        if key == 'indian':
+            return self.indian
+        if key == 'bowling_option':
+            return np.array([b is not None for b in self.bowler_types], dtype=bool)
+        for code, role_name in enumerate(ROLE_NAMES[:ROLE_OTHER]):
+            if key == role_name.lower():
+                return self.role == code
+        bowler_types = np.array([str(b).strip().lower() if b is not None else '' for b in self.bowler_types])
+        if key in bowler_types:
+            return bowler_types == key
+        raise ValueError(f"Unknown squad group: {name}")
+
+    @property
+    def decision_matrix(self) -> np.ndarray:
+        return np.column_stack([self.form, self.consistency])
+
+    def squad_stats(self, picks: np.ndarray) -> Dict[str, np.ndarray]:
+        """Per-squad counts for a (squads x positions) matrix of row indices"""
+        role = self.role[picks]
+        return {
+            "indian": self.indian[picks].sum(axis=1),
+            "foreign": self.overseas[picks].sum(axis=1),
+            "Batsman": (role == ROLE_BAT).sum(axis=1),
+            "Bowler": (role == ROLE_BOWL).sum(axis=1),
+            "Allrounder": (role == ROLE_AR).sum(axis=1),
+            "Wicketkeeper": (role == ROLE_WK).sum(axis=1),
+        }
+
+
+def _rank_within_state(state: np.ndarray, totals: np.ndarray, picks: np.ndarray, k: int) -> np.ndarray:
+    """
+    Row order grouping by state, then best total first, ties in itertools.product order,
+    truncated to the first k rows of every state.
+    """
+    keys = [picks[:, j] for j in range(picks.shape[1] - 1, -1, -1)] + [-totals, state]
+    order = np.lexsort(keys)
+    sorted_state = state[order]
+    group_start = np.searchsorted(sorted_state, sorted_state, side='left')
+    rank = np.arange(len(order)) - group_start
+    return order[rank < k]
+
+
+def top_k_squads(
+    scores: np.ndarray,
+    overseas: np.ndarray,
+    keepers: np.ndarray,
+    slots: Sequence[np.ndarray],
+    k: int = 5,
+    overseas_count: int = 4,
+    require_keeper: bool = True,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the k highest scoring squads picking one candidate row from each slot.
+
+    scores/overseas/keepers are per-row arrays and slots holds the candidate row indices
+    for each position. A squad must contain exactly `overseas_count` overseas players and,
+    if `require_keeper`, at least one keeper.
+
+    Runs a DP over positions whose state is (overseas picked, keeper picked), keeping only
+    the best k partial squads per state, so the full product is never materialized. Ties
+    keep itertools.product order, matching an exhaustive sort.
+
+    Returns (totals, picks): totals has shape (m,), picks has shape (m, positions) of row
+    indices, best squad first, with m <= k.
+    """
+    n = len(slots)
+    empty = (np.zeros(0), np.zeros((0, n), dtype=np.intp))
+    if k <= 0 or n == 0 or any(len(s) == 0 for s in slots):
+        return empty
+
+    scores = np.asarray(scores, dtype=float)
+    overseas = np.asarray(overseas, dtype=np.int64)
+    keepers = np.asarray(keepers, dtype=np.int64)
+
+    # Overseas picks still obtainable from positions i.. (to drop states that can't finish)
+    max_overseas_after = np.zeros(n + 1, dtype=np.int64)
+    min_overseas_after = np.zeros(n + 1, dtype=np.int64)
+    for i in range(n - 1, -1, -1):
+        max_overseas_after[i] = max_overseas_after[i + 1] + overseas[slots[i]].max()
+        min_overseas_after[i] = min_overseas_after[i + 1] + overseas[slots[i]].min()
+
+    picks = np.zeros((1, 0), dtype=np.intp)
+    totals = np.zeros(1)
+    n_overseas = np.zeros(1, dtype=np.int64)
+    has_keeper = np.zeros(1, dtype=np.int64)
+
+    for i, cand in enumerate(slots):
+        m, c = len(totals), len(cand)
+        picks = np.hstack([np.repeat(picks, c, axis=0), np.tile(cand, m)[:, None]])
+        totals = np.repeat(totals, c) + np.tile(scores[cand], m)
+        n_overseas = np.repeat(n_overseas, c) + np.tile(overseas[cand], m)
+        has_keeper = np.repeat(has_keeper, c) | np.tile(keepers[cand], m)
+
+        feasible = (n_overseas + min_overseas_after[i + 1] <= overseas_count) & \
+                   (n_overseas + max_overseas_after[i + 1] >= overseas_count)
+        state = n_overseas * 2 + has_keeper
+        keep = np.flatnonzero(feasible)
+        keep = keep[_rank_within_state(state[keep], totals[keep], picks[keep], k)]
+
+        picks, totals = picks[keep], totals[keep]
+        n_overseas, has_keeper = n_overseas[keep], has_keeper[keep]
+
+    valid = n_overseas == overseas_count
+    if require_keeper:
+        valid &= has_keeper == 1
+    picks, totals = picks[valid], totals[valid]
+    best = _rank_within_state(np.zeros(len(totals), dtype=np.int64), totals, picks, k)
+    return totals[best], picks[best]
+
+
+class SquadConstraints:
+    """
+    Declarative squad rules compiled against one team sheet.
+
+    A squad fills every batting position in `positions` with a distinct player, plus
+    `squad_size - len(positions)` reserves without a position (so `positions=[]` with
+    `squad_size=25` picks a full squad). `counts` maps a TeamArrays.group name to a
+    (min, max) pair, either side None; locked players must be picked, excluded ones
+    never are. Players can fill their sheet position, positions within `position_flex`
+    of it and any listed for them in `eligible`.
+    """
+
+    def __init__(self, team: TeamArrays, positions: Optional[Sequence[int]] = None,
+                 squad_size: Optional[int] = None,
+                 counts: Optional[Dict[str, Tuple[Optional[int], Optional[int]]]] = None,
+                 locked: Iterable[str] = (), excluded: Iterable[str] = (),
+                 eligible: Optional[Dict[str, Sequence[int]]] = None, position_flex: int = 0):
+        self.team = team
+        self.positions = list(team.positions if positions is None else positions)
+        self.squad_size = len(self.positions) if squad_size is None else squad_size
+        if len(set(self.positions)) != len(self.positions):
+            raise ValueError("Positions must not repeat")
+        if self.squad_size < len(self.positions):
+            raise ValueError("squad_size must be at least the number of positions")
+        if position_flex < 0:
+            raise ValueError("position_flex must not be negative")
+
+        rows = {name: i for i, name in enumerate(team.names)}
+
+        def row_of(name: str) -> int:
+            if name not in rows:
+                raise ValueError(f"Unknown player: {name}")
+            return rows[name]
+
+        self.counts = []
+        for group, (low, high) in (counts or {}).items():
+            if low is not None and high is not None and low > high:
+                raise ValueError(f"Minimum above maximum for {group}")
+            self.counts.append((team.group(group), low, high))
+
+        self.locked = sorted({row_of(name) for name in locked})
+        self.excluded = sorted({row_of(name) for name in excluded})
+        if set(self.locked) & set(self.excluded):
+            raise ValueError("A player can't be both locked and excluded")
+
+        # (row, position) pairs a player may fill
+        position = team.position.astype(np.int64)
+        extra = {row_of(name): set(p) for name, p in (eligible or {}).items()}
+        allowed = np.ones(len(team.names), dtype=bool)
+        allowed[self.excluded] = False
+        self.pairs: List[Tuple[int, int]] = []
+        for pos in self.positions:
+            fits = np.abs(position - pos) <= position_flex
+            for row, extra_positions in extra.items():
+                fits[row] |= pos in extra_positions
+            self.pairs.extend((int(row), pos) for row in np.flatnonzero(fits & allowed))
+        self.reserve_rows = np.flatnonzero(allowed) if self.squad_size > len(self.positions) else np.zeros(0, np.intp)
+
+
+def constrained_top_k_squads(scores: np.ndarray, constraints: SquadConstraints,
+                             k: int = 5) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find the k highest scoring distinct squads (as sets of players) under `constraints`.
+
+    Solved as a 0/1 integer program with HiGHS: one variable per (player, position) pair
+    and per reserve candidate. After each solve, a cut excluding that exact set of players
+    is added and the program re-solved, so squads come out best first.
+
+    Returns (totals, picks, assigned): picks has shape (m, squad_size) of row indices with
+    positioned players in `positions` order followed by reserves, best scoring first;
+    assigned holds the position each pick fills (its sheet position for reserves).
+    Raises SolverLimitError when a solve ends without a proven optimum, since a merely
+    feasible squad could be ranked (and cut) ahead of better ones.
+    """
+    # Imported here: scipy.optimize adds about half a second to startup
+    from scipy.optimize import Bounds, LinearConstraint, milp
+
+    n_players = len(constraints.team.names)
+    size = constraints.squad_size
+    n_positions = len(constraints.positions)
+    empty = (np.zeros(0), np.zeros((0, size), dtype=np.intp), np.zeros((0, size), dtype=np.int64))
+    pairs = constraints.pairs
+    reserves = constraints.reserve_rows
+    n_vars = len(pairs) + len(reserves)
+    if k <= 0 or size == 0 or n_vars == 0:
+        return empty
+
+    scores = np.nan_to_num(np.asarray(scores, dtype=float))
+    var_row = np.concatenate([np.array([row for row, _ in pairs], dtype=np.intp), reserves]).astype(np.intp)
+    # player x variable incidence: the squad indicator of a solution x is membership @ x
+    membership = np.zeros((n_players, n_vars))
+    membership[var_row, np.arange(n_vars)] = 1.0
+
+    position_index = {pos: i for i, pos in enumerate(constraints.positions)}
+    fill = np.zeros((n_positions, n_vars))
+    for v, (_, pos) in enumerate(pairs):
+        fill[position_index[pos], v] = 1.0
+
+    player_low = np.zeros(n_players)
+    player_low[constraints.locked] = 1.0
+    rows = [
+        LinearConstraint(fill, 1.0, 1.0),
+        LinearConstraint(membership, player_low, 1.0),
+        LinearConstraint(membership.sum(axis=0, keepdims=True), size, size),
+    ]
+    if len(reserves):
+        reserve_count = np.zeros((1, n_vars))
+        reserve_count[0, len(pairs):] = 1.0
+        rows.append(LinearConstraint(reserve_count, size - n_positions, size - n_positions))
+    for mask, low, high in constraints.counts:
+        rows.append(LinearConstraint(mask.astype(float) @ membership,
+                                     -np.inf if low is None else low, np.inf if high is None else high))
+
+    objective = -(scores @ membership)
+    totals, picks, assigned = [], [], []
+    for _ in range(k):
+        result = milp(objective, constraints=rows, integrality=np.ones(n_vars), bounds=Bounds(0, 1),
+                      options={"time_limit": SOLVER_TIME_LIMIT})
+        if result.status == MILP_INFEASIBLE:
+            break
+        if result.status != MILP_OPTIMAL:
+            raise SolverLimitError(f"Squad search stopped after {len(picks)} of {k} squads: {result.message}")
+        chosen = np.flatnonzero(result.x > 0.5)
+        positioned = sorted((position_index[pairs[v][1]], var_row[v]) for v in chosen if v < len(pairs))
+        reserve_picks = sorted((var_row[v] for v in chosen if v >= len(pairs)), key=lambda r: (-scores[r], r))
+        squad = [row for _, row in positioned] + reserve_picks
+        picks.append(squad)
+        assigned.append([constraints.positions[i] for i, _ in positioned]
+                        + [int(constraints.team.position[r]) for r in reserve_picks])
+        totals.append(float(scores[squad].sum()))
+        # Exclude this set of players from later solves
+        cut = np.zeros(n_players)
+        cut[squad] = 1.0
+        rows.append(LinearConstraint(cut @ membership, -np.inf, size - 1))
+
+    if not picks:
+        return empty
+    return np.array(totals), np.array(picks, dtype=np.intp), np.array(assigned, dtype=np.int64)
@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder is used instead
+    orjson = None
+
+# Responses smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+
+# Filter operators accepted in "column<op>value" query parameters, longest first
+FILTER_OPERATORS = [('>=', 'min'), ('<=', 'max'), ('~', 'contains'), ('=', 'eq')]
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=str, separators=(',', ':')).encode()
+
+
+def file_version(path: str) -> str:
+    """Version of a stats file; changes whenever the file is rewritten"""
+    st = os.stat(path)
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def query_key(**query) -> str:
+    return json.dumps(query, sort_keys=True, default=str)
+
+
+def make_etag(version: str, key: str) -> str:
+    # Weak: the same representation may be sent gzipped or not
+    return 'W/"' + hashlib.sha1(f"{version}|{key}".encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return '*' in tags or etag in tags or etag[2:] in tags
+
+
+def parse_filter_params(params: Optional[List[str]]) -> Dict[str, Any]:
+    """
+    Turn "column<op>value" query parameters into the filters accepted by StatsTable.query,
+    e.g. ["Runs>=300", "Type=BAT", "Player~sharma"].
+    """
+    filters: Dict[str, Any] = {}
+    for param in params or []:
+        for symbol, op in FILTER_OPERATORS:
+            column, sep, value = param.partition(symbol)
+            if sep and column:
+                break
+        else:
+            raise ValueError(f"Invalid filter: {param}")
+        try:
+            value = float(value) if op != 'contains' else value
+        except ValueError:
+            pass
+        if op == 'eq':
+            filters[column] = value
+        else:
+            condition = filters.get(column)
+            if not isinstance(condition, dict):
+                condition = {}
+                filters[column] = condition
+            condition[op] = value
+    return filters
+
+
+class StatsTable:
+    """
+    A stats sheet prepared for repeated queries: rows are converted to JSON-ready records
+    once, and numeric and lower-cased text views of columns are built on first use.
+
+    query() filters, sorts, pages and projects the records; render() returns the
+    serialized (and optionally gzipped) response body, memoized per query.
+    """
+
+    def __init__(self, df: pd.DataFrame, max_responses: int = 256):
+        self.df = df
+        self.columns = [str(c) for c in df.columns]
+        clean = df.astype(object).where(df.notna(), None)
+        clean.columns = self.columns
+        self.records: List[Dict[str, Any]] = clean.to_dict(orient="records")
+        self._numeric: Dict[str, np.ndarray] = {}
+        self._text: Dict[str, np.ndarray] = {}
+        self.max_responses = max_responses
+        self._responses: "OrderedDict[tuple, Tuple[bytes, bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # The lock can't be pickled and memoized responses aren't worth keeping
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_responses'] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _column(self, column: str) -> pd.Series:
+        if column not in self.columns:
+            raise ValueError(f"Unknown column: {column}")
+        return self.df.iloc[:, self.columns.index(column)]
+
+    def _numeric_values(self, column: str) -> np.ndarray:
+        values = self._numeric.get(column)
+        if values is None:
+            values = pd.to_numeric(self._column(column), errors='coerce').to_numpy(dtype=float)
+            self._numeric[column] = values
+        return values
+
+    def _text_values(self, column: str) -> np.ndarray:
+        values = self._text.get(column)
+        if values is None:
+            series = self._column(column)
+            values = series.astype(str).str.strip().str.lower().where(series.notna(), '').to_numpy(dtype=object)
+            self._text[column] = values
+        return values
+
+    def _is_numeric(self, column: str) -> bool:
+        return pd.api.types.is_numeric_dtype(self._column(column))
+
+    def _match(self, column: str, condition: Any) -> np.ndarray:
+        if isinstance(condition, dict):
+            mask = np.ones(len(self.records), dtype=bool)
+            for op, value in condition.items():
+                if op == 'min':
+                    mask &= self._numeric_values(column) >= float(value)
+                elif op == 'max':
+                    mask &= self._numeric_values(column) <= float(value)
+                elif op == 'contains':
+                    needle = str(value).strip().lower()
+                    mask &= np.array([needle in text for text in self._text_values(column)], dtype=bool)
+                else:
+                    raise ValueError(f"Unknown filter operator for {column}: {op}")
+            return mask
+        if isinstance(condition, (int, float)) and not isinstance(condition, bool):
+            return self._numeric_values(column) == float(condition)
+        return self._text_values(column) == str(condition).strip().lower()
+
+    def query(self, columns: Optional[List[str]] = None, filters: Optional[Dict[str, Any]] = None,
+              sort_by: Optional[str] = None, descending: bool = False,
+              page: int = 1, page_size: Optional[int] = None) -> Dict[str, Any]:
+        """Matching rows as a response payload; page_size None returns every matching row"""
+        for column in columns or []:
+            self._column(column)
+        if page < 1 or (page_size is not None and page_size < 1):
+            raise ValueError("page and page_size must be positive")
+
+        mask = np.ones(len(self.records), dtype=bool)
+        for column, condition in (filters or {}).items():
+            mask &= self._match(column, condition)
+        rows = np.flatnonzero(mask)
+
+        if sort_by is not None:
+            key = self._numeric_values(sort_by) if self._is_numeric(sort_by) else self._text_values(sort_by)
+            order = pd.Series(key[rows]).sort_values(ascending=not descending, kind='stable', na_position='last')
+            rows = rows[order.index.to_numpy()]
+
+        total = len(rows)
+        if page_size is not None:
+            rows = rows[(page - 1) * page_size:page * page_size]
+
+        if columns:
+            stats = [{c: self.records[i][c] for c in columns} for i in rows]
+        else:
+            stats = [self.records[i] for i in rows]
+        return {
+            "stats": stats,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "columns": columns or self.columns,
+        }
+
+    def render(self, accept_gzip: bool = False, **query) -> Tuple[bytes, bool]:
+        """Serialized query() response and whether it is gzipped"""
+        cache_key = (query_key(**query), accept_gzip)
+        with self._lock:
+            cached = self._responses.get(cache_key)
+            if cached is not None:
+                self._responses.move_to_end(cache_key)
+                return cached
+        body = dumps(self.query(**query))
+        compressed = accept_gzip and len(body) >= GZIP_MIN_BYTES
+        if compressed:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        with self._lock:
+            self._responses[cache_key] = (body, compressed)
+            while len(self._responses) > self.max_responses:
+                self._responses.popitem(last=False)
+        return body, compressed
@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+# Weights are rounded before caching so slider values that differ only by float noise share an entry
+WEIGHT_DECIMALS = 6
+
+
+def normalize_decision_matrix(decision_matrix: np.ndarray) -> np.ndarray:
+    """Vector-normalize each criterion column (the weight independent part of TOPSIS)"""
+    norm_denominator = np.sqrt((decision_matrix ** 2).sum(axis=0))
+    return decision_matrix / norm_denominator
+
+
+def topsis_scores(norm_matrix: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    TOPSIS closeness for a normalized (players x criteria) matrix.
+
+    weights is either one weight vector, giving a (players,) result, or a
+    (pairs x criteria) grid, giving a (pairs x players) result in one pass.
+    """
+    weights = np.asarray(weights, dtype=float)
+    single = weights.ndim == 1
+    weights = np.atleast_2d(weights)
+
+    # Apply weights: (pairs x players x criteria)
+    weighted_norm_matrix = norm_matrix[None, :, :] * weights[:, None, :]
+
+    # Determine ideal and anti-ideal solutions per weight pair
+    ideal_solution = weighted_norm_matrix.max(axis=1, keepdims=True)
+    anti_ideal_solution = weighted_norm_matrix.min(axis=1, keepdims=True)
+
+    # Calculate distances
+    distance_to_ideal = np.sqrt(((weighted_norm_matrix - ideal_solution) ** 2).sum(axis=2))
+    distance_to_anti_ideal = np.sqrt(((weighted_norm_matrix - anti_ideal_solution) ** 2).sum(axis=2))
+
+    scores = distance_to_anti_ideal / (distance_to_ideal + distance_to_anti_ideal)
+    return scores[0] if single else scores
+
+
+class TopsisStore:
+    """
+    Per-team normalized decision matrices plus an LRU of TOPSIS results keyed by
+    (team, rounded form weight, rounded consistency weight).
+
+    A team's entries are dropped when it is registered with a different source object,
+    i.e. when its sheet has been reloaded.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._norm: Dict[str, Tuple[object, np.ndarray]] = {}
+        self._results: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def weight_key(form_weight: float, consistency_weight: float) -> Tuple[float, float]:
+        return (round(float(form_weight), WEIGHT_DECIMALS), round(float(consistency_weight), WEIGHT_DECIMALS))
+
+    def _norm_matrix(self, team_name: str, source, decision_matrix: np.ndarray) -> np.ndarray:
+        entry = self._norm.get(team_name)
+        if entry is None or entry[0] is not source:
+            entry = (source, normalize_decision_matrix(decision_matrix))
+            self._norm[team_name] = entry
+            for key in [key for key in self._results if key[0] == team_name]:
+                del self._results[key]
+        return entry[1]
+
+    def _remember(self, key: tuple, scores: np.ndarray):
+        self._results[key] = scores
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def scores(self, team_name: str, source, decision_matrix: np.ndarray,
+               form_weight: float, consistency_weight: float) -> np.ndarray:
+        """TOPSIS scores for one weight pair; `source` identifies the current version of the sheet"""
+        return self.scores_batch(team_name, source, decision_matrix, [(form_weight, consistency_weight)])[0]
+
+    def scores_batch(self, team_name: str, source, decision_matrix: np.ndarray,
+                     weight_pairs: Sequence[Tuple[float, float]]) -> np.ndarray:
+        """(pairs x players) TOPSIS scores; uncached pairs are computed together in one vectorized pass"""
+        keys = [self.weight_key(fw, cw) for fw, cw in weight_pairs]
+        with self._lock:
+            norm_matrix = self._norm_matrix(team_name, source, decision_matrix)
+            found = {}
+            for key in keys:
+                cached = self._results.get((team_name,) + key)
+                if cached is not None:
+                    self._results.move_to_end((team_name,) + key)
+                    found[key] = cached
+            missing = list(dict.fromkeys(key for key in keys if key not in found))
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            computed = topsis_scores(norm_matrix, np.array(missing))
+            with self._lock:
+                for key, row in zip(missing, computed):
+                    row.setflags(write=False)
+                    self._remember((team_name,) + key, row)
+                    found[key] = row
+
+        return np.stack([found[key] for key in keys])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "teams": len(self._norm),
+                "entries": len(self._results),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
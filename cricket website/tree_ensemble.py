@@ -0,0 +1,128 @@
+"""
+NumPy evaluation of a saved XGBoost regression model.
+
+The boosters are stored as XGBoost JSON models; TreeEnsemble reads that file directly and
+evaluates every tree with array indexing, so serving predictions needs neither xgboost nor
+the scikit-learn stack it imports (together well over a second of startup). Splits compare
+float32 feature values with `<` and route missing values to the default child, and leaf
+values are accumulated in float32 tree by tree, matching Booster.predict.
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Objectives whose prediction is the raw margin
+IDENTITY_OBJECTIVES = {'reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror'}
+
+
+def _parse_float(value: str) -> float:
+    # base_score is saved as "1.7E1" by older releases and "[1.7E1]" by newer ones
+    return float(value.strip('[]'))
+
+
+class TreeEnsemble:
+    """
+    A single-target gradient boosted tree model as flat node arrays.
+
+    Node i of tree t lives at index t * max_nodes + i and children are stored as flat
+    indices. A leaf is its own left child with an infinite threshold, so walking `depth`
+    levels lands every row on a leaf without checking which rows have already arrived.
+    XGBoost allocates a right child directly after its left sibling, which lets a step
+    compute `left + went_right` instead of gathering both children.
+    """
+
+    def __init__(self, trees: List[Dict[str, Any]], base_score: float,
+                 feature_names: Optional[List[str]] = None):
+        n_trees = len(trees)
+        max_nodes = max((len(t['left_children']) for t in trees), default=1)
+        self.n_trees = n_trees
+        self.base_score = np.float32(base_score)
+        self.feature_names = feature_names
+        self.roots = np.arange(n_trees, dtype=np.intp) * max_nodes
+        size = n_trees * max_nodes
+        own = np.arange(size, dtype=np.intp)
+        self.left = own.copy()
+        self.right = own.copy()
+        self.feature = np.zeros(size, dtype=np.intp)
+        self.threshold = np.full(size, np.inf, dtype=np.float32)
+        self.default_left = np.ones(size, dtype=bool)
+        self.value = np.zeros(size, dtype=np.float32)
+        self.depth = 0
+        for t, tree in enumerate(trees):
+            if any(tree.get('split_type', [])):
+                raise ValueError("Categorical splits are not supported")
+            left = np.array(tree['left_children'], dtype=np.intp)
+            right = np.array(tree['right_children'], dtype=np.intp)
+            # For leaves split_conditions holds the leaf value
+            conditions = np.array(tree['split_conditions'], dtype=np.float32)
+            leaf = left == -1
+            nodes = self.roots[t] + np.arange(len(left), dtype=np.intp)
+            split = nodes[~leaf]
+            self.left[split] = self.roots[t] + left[~leaf]
+            self.right[split] = self.roots[t] + right[~leaf]
+            self.feature[split] = np.array(tree['split_indices'], dtype=np.intp)[~leaf]
+            self.threshold[split] = conditions[~leaf]
+            self.default_left[split] = np.array(tree['default_left'], dtype=bool)[~leaf]
+            self.value[nodes[leaf]] = conditions[leaf]
+            self.depth = max(self.depth, self._tree_depth(left, right))
+        self.adjacent_children = bool(np.all((self.right == self.left + 1) | (self.right == self.left)))
+
+    @staticmethod
+    def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+        depth, frontier = 0, np.array([0])
+        while True:
+            children = np.concatenate([left[frontier], right[frontier]])
+            frontier = children[children != -1]
+            if len(frontier) == 0:
+                return depth
+            depth += 1
+
+    @classmethod
+    def from_json(cls, model: Dict[str, Any]) -> 'TreeEnsemble':
+        learner = model['learner']
+        objective = learner['objective']['name']
+        if objective not in IDENTITY_OBJECTIVES:
+            raise ValueError(f"Unsupported objective: {objective}")
+        params = learner['learner_model_param']
+        if int(params.get('num_class', 0)) > 1 or int(params.get('num_target', 1)) > 1:
+            raise ValueError("Only single-target regression models are supported")
+        booster = learner['gradient_booster']
+        if booster.get('name', 'gbtree') != 'gbtree':
+            raise ValueError(f"Unsupported booster: {booster.get('name')}")
+        return cls(booster['model']['trees'], _parse_float(params['base_score']),
+                   learner.get('feature_names') or None)
+
+    @classmethod
+    def load(cls, path: str) -> 'TreeEnsemble':
+        """Read a model written by Booster.save_model(".json")"""
+        with open(path) as f:
+            return cls.from_json(json.load(f))
+
+    @classmethod
+    def from_booster(cls, booster) -> 'TreeEnsemble':
+        return cls.from_json(json.loads(bytes(booster.save_raw(raw_format='json'))))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predictions for a (rows x features) matrix"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        has_missing = bool(np.isnan(flat_x).any())
+        row_offset = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, self.n_trees))
+        for _ in range(self.depth):
+            value = flat_x[row_offset + self.feature[node]]
+            go_left = value < self.threshold[node]
+            if has_missing:
+                # NaN fails every comparison, so missing values follow default_left
+                go_left |= np.isnan(value) & self.default_left[node]
+            if self.adjacent_children:
+                node = self.left[node] + ~go_left
+            else:
+                node = np.where(go_left, self.left[node], self.right[node])
+        # Sequential float32 sums (cumsum doesn't reorder), starting from the base score
+        leaves = np.empty((n_rows, self.n_trees + 1), dtype=np.float32)
+        leaves[:, 0] = self.base_score
+        leaves[:, 1:] = self.value[node]
+        return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
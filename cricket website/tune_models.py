@@ -0,0 +1,148 @@
+"""
+Cross-validated hyperparameter sweep for the MatchPredictor boosters.
+
+Each booster config is cross-validated in a process pool with folds grouped by match, and
+the pool's workers split the machine's cores between them through `nthread` so XGBoost
+doesn't oversubscribe. The best player config is trained first, the aggregator set is
+built from it, then the aggregator is swept the same way and both models are saved.
+
+    python tune_models.py --data ../all_matches.csv --workers 4
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import GroupKFold
+
+from ml_predictor import DEFAULT_PARAMS, MatchPredictor
+
+PLAYER_GRID = {
+    'max_depth': [4, 6, 8],
+    'learning_rate': [0.03, 0.05, 0.1],
+    'min_child_weight': [1, 5],
+}
+AGG_GRID = {
+    'max_depth': [3, 4, 6],
+    'learning_rate': [0.03, 0.05, 0.1],
+    'subsample': [0.8, 1.0],
+}
+
+# Data shared with pool workers, set once per process by _init_worker
+_X = None
+_y = None
+_folds = None
+_feature_names = None
+
+
+def _init_worker(X, y, folds, feature_names):
+    global _X, _y, _folds, _feature_names
+    _X, _y, _folds, _feature_names = X, y, folds, feature_names
+
+
+def _cross_validate(task: Tuple[Dict, int, int]) -> Dict:
+    params, num_boost_round, nthread = task
+    params = dict(DEFAULT_PARAMS, **params, tree_method='hist', nthread=nthread,
+                  eval_metric=['mae', 'rmse'])
+    start = time.perf_counter()
+    dtrain = xgb.DMatrix(_X, label=_y, feature_names=_feature_names, nthread=nthread)
+    history = xgb.cv(
+        params, dtrain, num_boost_round=num_boost_round, folds=_folds,
+        early_stopping_rounds=20, verbose_eval=False,
+    )
+    best = history.iloc[-1]
+    return {
+        'params': params,
+        'rounds': len(history),
+        'rmse': float(best['test-rmse-mean']),
+        'mae': float(best['test-mae-mean']),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def sweep(name, X, y, groups, feature_names, grid, num_boost_round, workers, n_splits=5) -> Dict:
+    """Cross-validate every config of `grid` in parallel and return the best result by RMSE"""
+    folds = list(GroupKFold(n_splits=n_splits).split(X, y, groups))
+    configs = expand_grid(grid)
+    workers = max(1, min(workers, len(configs)))
+    nthread = max(1, (os.cpu_count() or 1) // workers)
+
+    print(f"\n{name}: {len(configs)} configs, {n_splits} folds, {workers} workers x {nthread} threads")
+    start = time.perf_counter()
+    tasks = [(config, num_boost_round, nthread) for config in configs]
+    # spawn rather than fork: by the aggregator sweep, train_player_model has started
+    # OpenMP threads in this process, and a forked libgomp child can deadlock
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X, y, folds, feature_names),
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        results = list(pool.map(_cross_validate, tasks))
+    wall = time.perf_counter() - start
+
+    for config, result in sorted(zip(configs, results), key=lambda cr: cr[1]['rmse']):
+        print(f"  {config}  rounds={result['rounds']:<4} rmse={result['rmse']:.3f} "
+              f"mae={result['mae']:.3f}  {result['seconds']:.1f}s")
+    print(f"  wall time {wall:.1f}s")
+
+    best_config, best = min(zip(configs, results), key=lambda cr: cr[1]['rmse'])
+    best['config'] = best_config
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated sweep for the player and aggregator boosters")
+    parser.add_argument('--data', default='../all_matches.csv', help="ball-by-ball CSV")
+    parser.add_argument('--player-model', default='models/player_model.json')
+    parser.add_argument('--agg-model', default='models/agg_model.json')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="parallel configs; cores are split evenly between them")
+    parser.add_argument('--folds', type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    predictor = MatchPredictor()
+    df_total = predictor.load_data(args.data)
+    print(f"Loaded features in {time.perf_counter() - start:.1f}s")
+
+    # Player model: one row per player innings, folds grouped by match
+    dp = predictor.df_player
+    best_player = sweep(
+        'player model',
+        dp[predictor.features_player].to_numpy(dtype=float), dp['player_runs'].to_numpy(dtype=float),
+        dp['match_id'].to_numpy(), predictor.features_player,
+        PLAYER_GRID, 300, args.workers, args.folds,
+    )
+    player_params = dict(DEFAULT_PARAMS, **best_player['config'], tree_method='hist')
+    predictor.train_player_model(player_params)
+
+    # Aggregator: one row per match, built from the chosen player model
+    df_agg = predictor.build_aggregator_set(df_total).dropna(subset=['total'])
+    best_agg = sweep(
+        'aggregator',
+        df_agg[predictor.features_agg].to_numpy(dtype=float), df_agg['total'].to_numpy(dtype=float),
+        np.arange(len(df_agg)), predictor.features_agg,
+        AGG_GRID, 200, args.workers, args.folds,
+    )
+    agg_params = dict(DEFAULT_PARAMS, **best_agg['config'], tree_method='hist')
+    predictor.train_aggregator_model(df_total, agg_params)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.player_model)), exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(args.agg_model)), exist_ok=True)
+    predictor.save_models(args.player_model, args.agg_model)
+    print(f"\nBest player config {best_player['config']} rmse={best_player['rmse']:.3f} mae={best_player['mae']:.3f}")
+    print(f"Best aggregator config {best_agg['config']} rmse={best_agg['rmse']:.3f} mae={best_agg['mae']:.3f}")
+    print(f"Saved models to {args.player_model} and {args.agg_model} "
+          f"(total {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
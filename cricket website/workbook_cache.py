@@ -0,0 +1,107 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Union
+
+import pandas as pd
+
+import feature_store
+
+SheetName = Union[str, int]
+
+
+class WorkbookCache:
+    """
+    Keeps parsed Excel sheets in memory so request handlers don't re-run openpyxl.
+    Misses are served from the Parquet feature store when it holds a fresh copy.
+
+    Entries are keyed by (absolute path, sheet name) and are reloaded when the file's
+    mtime changes. The cache is bounded by entry count and approximate DataFrame size,
+    evicting the least recently used sheets first.
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _frame_size(df: pd.DataFrame) -> int:
+        return int(df.memory_usage(deep=True).sum())
+
+    def _store(self, key: tuple, mtime: float, df: pd.DataFrame):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[2]
+        size = self._frame_size(df)
+        self._entries[key] = (mtime, df, size)
+        self._bytes += size
+        # Evict least recently used sheets, but always keep the one just loaded
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, old_size) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+            self.evictions += 1
+
+    def get(self, path: str, sheet_name: SheetName = 0) -> pd.DataFrame:
+        """Return the parsed sheet, reading the workbook only on a miss or when the file changed.
+
+        The returned DataFrame is shared between callers and must not be modified in place.
+        """
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        key = (path, sheet_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            df = feature_store.read_sheet(path, sheet_name=sheet_name)
+            self._store(key, mtime, df)
+            return df
+
+    def preload(self, path: str, sheet_names: Optional[Iterable[SheetName]] = None):
+        """Parse a workbook up front; with no sheet_names every sheet is loaded in a single read"""
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        if sheet_names is None:
+            sheets: Dict[Any, pd.DataFrame] = feature_store.read_workbook(path)
+        else:
+            sheets = {name: feature_store.read_sheet(path, sheet_name=name) for name in sheet_names}
+        with self._lock:
+            for name, df in sheets.items():
+                self._store((path, name), mtime, df)
+        return list(sheets)
+
+    def entries(self) -> Dict[tuple, tuple]:
+        """Every cached (path, sheet) -> (mtime, DataFrame), e.g. to snapshot the cache"""
+        with self._lock:
+            return {key: (mtime, df) for key, (mtime, df, _) in self._entries.items()}
+
+    def restore(self, entries: Dict[tuple, tuple]):
+        """Load entries saved by entries(); files changed since then reload on their next get()"""
+        with self._lock:
+            for key, (mtime, df) in entries.items():
+                self._store(key, mtime, df)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
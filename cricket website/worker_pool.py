@@ -0,0 +1,192 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+import metrics
+
+
+class EndpointLimit:
+    """Concurrency limit and admission queue for one endpoint"""
+
+    def __init__(self, concurrency: int, max_queue: int, queue_timeout: float):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+
+def _call(fn: Callable, args: tuple, profile: bool = False,
+          counters: Optional[Callable] = None) -> Tuple[str, Any, Dict[str, float], Optional[Dict], Optional[Tuple]]:
+    """
+    Run `fn` in a worker, collecting its stage timings, when asked a sampled profile, and
+    the worker's (pid, counters()) afterwards. HTTPException doesn't survive pickling, so it
+    comes back as a (status, detail, headers) tuple and is re-raised in the server process.
+    """
+    profiler = metrics.SamplingProfiler() if profile else None
+    if profiler is not None:
+        profiler.start()
+    with metrics.collect() as timings:
+        try:
+            status, value = 'ok', fn(*args)
+        except HTTPException as e:
+            status, value = 'http_error', (e.status_code, e.detail, e.headers)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+    report = profiler.report() if profiler is not None else None
+    return status, value, timings, report, (os.getpid(), counters()) if counters is not None else None
+
+
+class WorkerPool:
+    """
+    Runs CPU-bound handler work off the event loop, collecting its stage timings.
+
+    Work goes to a process pool of `processes` workers (spawned, each set up once by
+    `initializer`), or to the event loop's default thread pool when `processes` is 0.
+    Every endpoint gets its own concurrency limit: requests over the limit wait up to
+    `queue_timeout` seconds for a slot, and are turned away with a 503 when the wait runs
+    out or `max_queue` requests are already waiting, so overload shows up as fast
+    rejections instead of an ever-growing backlog.
+
+    Workers keep their own caches, so `counters` (a picklable function returning a dict of
+    counter groups) runs in the worker after every call; worker_counters() returns the
+    latest result from each live worker.
+    """
+
+    def __init__(self, processes: int, limits: Dict[str, Tuple[int, int, float]],
+                 initializer: Optional[Callable] = None, counters: Optional[Callable] = None):
+        self.processes = processes
+        self.initializer = initializer
+        self.counters = counters
+        self.limits = {name: EndpointLimit(*limit) for name, limit in limits.items()}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._worker_counters: Dict[int, Dict[str, Dict[str, Any]]] = {}
+
+    def start(self):
+        if self.processes > 0 and self._executor is None:
+            # spawn rather than fork: the server process has live threads and OpenMP state
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=self.initializer,
+            )
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            # Queued calls are cancelled; run() turns that into a 503 for their requests
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._worker_counters = {}
+
+    def restart(self):
+        """Replace the workers, e.g. so they reload state the server process has refreshed"""
+        old, self._executor = self._executor, None
+        # Start the new pool first, so no call lands on the event loop's thread pool meanwhile
+        self.start()
+        self._worker_counters = {}
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _release(limit: EndpointLimit):
+        limit.running -= 1
+        limit.completed += 1
+        limit.semaphore.release()
+
+    @classmethod
+    def _call_done(cls, limit: EndpointLimit, future: asyncio.Future):
+        cls._release(limit)
+        if not future.cancelled():
+            future.exception()  # retrieved here in case the request stopped waiting for it
+
+    async def _acquire(self, name: str, limit: EndpointLimit):
+        if limit.waiting >= limit.max_queue and limit.semaphore.locked():
+            limit.rejected += 1
+            raise HTTPException(status_code=503, detail=f"Too many queued {name} requests",
+                                headers={"Retry-After": "1"})
+        limit.waiting += 1
+        try:
+            await asyncio.wait_for(limit.semaphore.acquire(), timeout=limit.queue_timeout)
+        except asyncio.TimeoutError:
+            limit.timed_out += 1
+            raise HTTPException(status_code=503, detail=f"Timed out waiting for a {name} worker",
+                                headers={"Retry-After": "1"})
+        finally:
+            limit.waiting -= 1
+
+    async def run(self, name: str, fn: Callable, *args) -> Any:
+        """Run fn(*args) under the named endpoint's limit and return its result"""
+        limit = self.limits[name]
+        queued = time.perf_counter()
+        await self._acquire(name, limit)
+        metrics.observe_stages(name, {"queue_wait": time.perf_counter() - queued})
+        limit.running += 1
+        profile = metrics.profile_request.get()
+        counters = self.counters if self.processes > 0 else None
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            future = loop.run_in_executor(executor, _call, fn, args, profile is not None, counters)
+        except (RuntimeError, BrokenProcessPool):
+            # The pool was shut down or broke between picking it and submitting the call
+            self._release(limit)
+            raise HTTPException(status_code=503, detail="Worker pool restarting, please retry",
+                                headers={"Retry-After": "1"})
+        # The slot is freed when the call finishes, not when this request stops waiting for
+        # it, so a cancelled request can't let more calls run than the limit allows
+        future.add_done_callback(lambda f: self._call_done(limit, f))
+        try:
+            status, value, timings, report, worker = await asyncio.shield(future)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); replace the pool for the next requests.
+            # Only the first call to see it broken restarts, so later ones don't cancel the
+            # calls already queued on the replacement
+            if executor is self._executor:
+                self.restart()
+            raise HTTPException(status_code=503, detail="Worker process failed, please retry",
+                                headers={"Retry-After": "1"})
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise  # this request was cancelled; the call runs on and frees its slot
+            # restart() or shutdown() dropped the call before a worker picked it up
+            raise HTTPException(status_code=503, detail="Worker pool restarting, please retry",
+                                headers={"Retry-After": "1"})
+        metrics.observe_stages(name, timings)
+        if worker is not None and executor is self._executor:
+            self._worker_counters[worker[0]] = worker[1]
+        if report is not None:
+            profile["id"] = metrics.store_profile(name, report)
+        if status == 'http_error':
+            raise HTTPException(status_code=value[0], detail=value[1], headers=value[2])
+        return value
+
+    def worker_counters(self) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        """Latest counters reported by each current worker process, by pid"""
+        return dict(self._worker_counters)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "processes": self.processes,
+            "endpoints": {
+                name: {
+                    "concurrency": limit.concurrency,
+                    "running": limit.running,
+                    "waiting": limit.waiting,
+                    "completed": limit.completed,
+                    "rejected": limit.rejected,
+                    "timed_out": limit.timed_out,
+                }
+                for name, limit in self.limits.items()
+            },
+        }